@@ -1,16 +1,34 @@
 import streamlit as st
 import pandas as pd
-import folium
-from streamlit_folium import st_folium
-import requests
-import random
+import numpy as np
 import hashlib
+import html
+import json
+import threading
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import assets
+import http_client
+import incremental
+import instrumentation
+import loader
+import map_view
+import shared_cache
+from pipeline import details_table, linked_values, project_metrics
 
 # =========================
 # 1. Initial Configuration
 # =========================
 st.set_page_config(layout="wide")
 
+def session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id[:8] if ctx else None
+
+# Tiempos por sección de cada rerun; se ven con ?debug=1 (sección 10)
+instrumentation.start_rerun("script", session_id())
+
 # =========================
 # 2. Custom CSS
 # =========================
@@ -91,13 +109,40 @@ st.markdown("""
         color: #b0b0b0;
     }
     /* Improved skill badge styling */
+    .skill-grid, .logo-grid {
+        display: grid;
+        grid-template-columns: repeat(6, minmax(0, 1fr));
+        gap: 4px;
+        align-items: center;
+    }
     .skill-badge {
+        color: white;
+        padding: 10px 15px;
+        border-radius: 20px;
+        text-align: center;
+        font-size: 0.9rem;
+        font-weight: 700;
+        margin: 6px 2px;
+        min-width: 90px;
+        box-shadow: 0 4px 15px rgba(0,0,0,0.2);
+        border: 2px solid rgba(255,255,255,0.1);
+        text-shadow: 1px 1px 2px rgba(0,0,0,0.3);
+        cursor: pointer;
         transition: transform 0.2s ease, box-shadow 0.2s ease;
     }
     .skill-badge:hover {
         transform: translateY(-2px);
         box-shadow: 0 6px 20px rgba(0,0,0,0.3) !important;
     }
+    .logo-grid img {
+        width: 80px;
+        height: auto;
+    }
+    .logo-fallback {
+        font-size: 0.7rem;
+        color: #b0b0b0;
+        text-align: center;
+    }
 </style>
 """, unsafe_allow_html=True)
 
@@ -136,103 +181,70 @@ def create_navigation_sidebar():
 
         st.markdown("<hr style='border: 1px solid #34495e;'>", unsafe_allow_html=True)
 
-create_navigation_sidebar()
+with instrumentation.stage("3 navigation"):
+    create_navigation_sidebar()
 
 # =========================
 # 4. Load Data with Project Duration Logic
 # =========================
-# 1. URL Directa
-data_url = "https://raw.githubusercontent.com/juancanolop/Dashboard_Juan_Cano/refs/heads/main/data.csv"
-
-# 2. Función sin caché para pruebas de conexión
-def load_data_debug(url):
-    try:
-        # Forzamos la descarga con un timeout largo
-        response = requests.get(url, timeout=15)
-        if response.status_code == 200:
-            import io
-            # Leemos el contenido raw
-            df = pd.read_csv(io.StringIO(response.text))
-            return df
-        else:
-            st.error(f"Error de GitHub: {response.status_code}")
-            return pd.DataFrame()
-    except Exception as e:
-        st.error(f"Error de red: {e}")
-        return pd.DataFrame()
-
-# 3. Ejecución
-df = load_data_debug(data_url)
+data_url = loader.DATA_URL
 
-# 4. Bloque de Diagnóstico (Si esto falla, el problema es el CSV)
-if df.empty:
-    st.error("No se pudieron cargar los datos.")
-    st.info("Intentando diagnóstico...")
-    # Prueba alternativa: ¿Podemos ver el texto del archivo?
-    test_res = requests.get(data_url)
-    st.code(test_res.text[:500], language="text") # Muestra los primeros 500 caracteres del CSV
-    st.stop()
+with instrumentation.stage("4 load data"):
+    # Versión y frame del mismo momento: una revalidación en segundo plano puede cambiarlos
+    df, load_info = loader.load_data_with_info(data_url)
+    instrumentation.cache_event("data", load_info["source"])
 
-# 5. Procesamiento una vez cargado
-df.columns = df.columns.str.strip()
-if "Year" in df.columns:
-    df["Year"] = pd.to_numeric(df["Year"], errors='coerce')
-    df = df.dropna(subset=["Year"])
-
-years = sorted(df["Year"].unique())
-min_year, max_year = int(min(years)), int(max(years))
-
-def expand_projects_by_duration(df):
-    if df.empty: return df
-
-    duration_col = next((col for col in ['Duration_Months', 'Duration', 'Months', 'Project_Duration'] if col in df.columns), None)
-    if not duration_col: return df
-
-    expanded_rows = []
-    for _, row in df.iterrows():
-        try:
-            duration_months = row[duration_col]
-            if pd.isna(duration_months) or duration_months <= 0:
-                expanded_rows.append(row.copy())
-                continue
-            duration_months = int(float(duration_months))
-            start_year = int(row['Year'])
-            end_year = start_year + (duration_months // 12)
-            years_affected = list(range(start_year, end_year + 1))
-
-            for year in years_affected:
-                new_row = row.copy()
-                new_row['Year'] = year
-                new_row['Original_Year'] = start_year
-                new_row['End_Year'] = end_year
-                new_row['Project_Span'] = f"{start_year}-{end_year}" if len(years_affected) > 1 else str(start_year)
-                new_row['Duration_Display'] = f"{duration_months} months ({start_year}-{end_year})" if len(years_affected) > 1 else f"{duration_months} months"
-                expanded_rows.append(new_row)
-        except:
-            expanded_rows.append(row.copy())
-    return pd.DataFrame(expanded_rows)
-
-df = load_data()
+# Bloque de Diagnóstico: sin red y sin snapshot en disco no hay nada que mostrar
 if df.empty:
     st.error("Failed to load data. Please check the CSV URL.")
+    load_error = load_info["error"]
+    if load_error:
+        st.code(load_error, language="text")
     st.stop()
 
-df = expand_projects_by_duration(df)
-
 # =========================
 # 4.5 Filter by Visibility in Dashboard
 # =========================
-if "show dashboard" in df.columns:
-    df = df[df["show dashboard"].astype(str).str.strip().str.lower() != "no"]
-else:
+if "show dashboard" not in df.columns:
     st.warning("⚠️ Column 'show dashboard' not found in data. Showing all projects.")
 
+# Ingesta: una fila por proyecto + tabla (project_id, Year) con los años activos,
+# roles/skills/software normalizados e índices de año y facetas.
+# Se calcula una sola vez por versión del CSV y por host: el primer worker lo
+# deja en la caché compartida y los demás lo cargan de ahí. Una versión nueva se
+# aplica como parche sobre la anterior, recalculando solo los proyectos que cambiaron.
+
+@st.cache_resource(show_spinner=False)
+def dataset_store():
+    return {"version": None, "dataset": None, "refresh": None, "lock": threading.Lock()}
+
+def get_dataset(data_version, df):
+    store = dataset_store()
+    with store["lock"]:
+        if store["dataset"] is None or store["version"] != data_version:
+            shared_key = f"{data_version}-{incremental.CODE_VERSION}"
+            shared = shared_cache.cache.get("dataset", shared_key)
+            if shared is not None:
+                store["dataset"], store["refresh"] = shared, {"mode": "shared"}
+            else:
+                store["dataset"], store["refresh"] = incremental.refresh_dataset(store["dataset"], df)
+                shared_cache.cache.set("dataset", shared_key, store["dataset"])
+            store["version"] = data_version
+            instrumentation.cache_event("dataset", store["refresh"]["mode"])
+        else:
+            instrumentation.cache_event("dataset", "hit")
+        return store["dataset"]
+
+with instrumentation.stage("4.5 dataset"):
+    dataset = get_dataset(load_info["version"], df)
+projects = dataset.projects
+active_index = dataset.active_index
+facet_index = dataset.facet_index
+
 # =========================
 # 5. Filters - PROTECCIÓN CONTRA VALORES VACÍOS
 # =========================
-# Aseguramos que la columna Year sea numérica y eliminamos nulos
-df["Year"] = pd.to_numeric(df["Year"], errors='coerce')
-years = sorted(df["Year"].dropna().unique())
+years = active_index.years
 
 # Validación crítica: Si no hay años, mostramos el error y detenemos la app
 if len(years) == 0:
@@ -244,135 +256,85 @@ if len(years) == 0:
 min_year = int(min(years))
 max_year = int(max(years))
 
-st.title("Projects Dashboard")
+def get_sidebar_years(sidebar_years):
+    return years if "All" in sidebar_years else [int(y) for y in sidebar_years if y.isdigit()]
 
-filter_col1, filter_col2 = st.columns([2, 1])
-with filter_col1:
-    selected_year_slider = st.slider(
-        "Select a specific year to highlight",
-        min_value=min_year,
-        max_value=max_year,
-        value=max_year,
-        key="timeline-slider",
-        help="This will be included in the filter along with sidebar selections"
-    )
+def get_filtered_years(sidebar_years, timeline_year, mode):
+    sidebar_year_list = get_sidebar_years(sidebar_years)
+    return sorted(set(sidebar_year_list + [timeline_year])) if mode == "Include timeline year" else sidebar_year_list
 
-with filter_col2:
-    filter_mode = st.radio(
-        "Filter Mode:",
-        options=["Include timeline year", "Only sidebar selection"],
-        index=0,
-        help="Choose how to combine timeline and sidebar filters"
-    )
+# Conteos "(n)" por opción según la selección actual del resto de facetas.
+# Solo dependen de la barra lateral, así mover el timeline no la re-ejecuta.
+with instrumentation.stage("5 facet counts"):
+    # Búsqueda por texto contra el índice invertido de la ingesta: puntaje por proyecto
+    search_scores = dataset.text_index.search(st.session_state.get("filter-search", ""))
+    sidebar_state = {
+        "Year": get_sidebar_years(st.session_state.get("filter-years", ["All"])),
+        "Industry": st.session_state.get("filter-industries") or None,
+        "Category": st.session_state.get("filter-categories") or None,
+        "Role": st.session_state.get("filter-roles") or None,
+    }
+    # El cubo no tiene dimensión de texto: con búsqueda se cuenta sobre los bitsets
+    if search_scores is None:
+        facet_counts = dataset.cube.counts(sidebar_state)
+    else:
+        facet_counts = facet_index.counts(sidebar_state, within=search_scores > 0)
+
+def with_count(facet):
+    return lambda value: f"{value} ({facet_counts[facet].get(value, 0)})"
 
 # Sidebar filters
-with st.sidebar:
+with st.sidebar, instrumentation.stage("5 sidebar filters"):
     st.markdown("### 🎯 **Filters**")
+
+    st.text_input(
+        "🔎 Search projects",
+        key="filter-search",
+        placeholder="Name, scope, client, location...",
+        help="Every word must match, also as the start of a word ('bri' finds 'bridge'). Best matches first."
+    )
     
     year_options = ["All"] + [str(year) for year in years]
     selected_years_sidebar = st.multiselect(
         "📅 Filter by years",
         options=year_options,
         default=["All"],
+        key="filter-years",
+        format_func=lambda y: y if y == "All" else with_count("Year")(int(y)),
         help="Select specific years or 'All' for all years"
     )
     
-    industries = sorted(df["Industry"].dropna().unique()) if "Industry" in df.columns else []
-    selected_industries = st.multiselect("🏢 Industries", industries, help="Filter by industry type")
+    industries = facet_index.values("Industry")
+    selected_industries = st.multiselect("🏢 Industries", industries, key="filter-industries", format_func=with_count("Industry"), help="Filter by industry type")
 
-    categories = sorted(df["Category"].dropna().unique()) if "Category" in df.columns else []
-    selected_categories = st.multiselect("📂 Categories", categories, help="Filter by project category") if categories else []
+    categories = facet_index.values("Category")
+    selected_categories = st.multiselect("📂 Categories", categories, key="filter-categories", format_func=with_count("Category"), help="Filter by project category") if categories else []
 
     # ✅ ARREGLADO: Filtro por Role con valores únicos
-    if "Role" in df.columns:
-        # Función para limpiar roles
-        def clean_role_value(role):
-            if pd.isna(role) or not isinstance(role, str):
-                return "Other"
-            role = role.strip()
-            role_mappings = {
-                'civil engineer': 'Civil Engineer',
-                'ceo': 'CEO',
-                'student': 'Student',
-                'teacher': 'Teacher',
-                'auxiliar / intern': 'Auxiliar / Intern',
-                'project manager': 'Project Manager',
-                'designer / consulter': 'Designer / Consulter',
-            }
-            role_lower = role.lower()
-            for key, value in role_mappings.items():
-                if key in role_lower:
-                    return value
-            return role.title() if role else "Other"
-        
+    if "Role" in projects.columns:
         # Obtener roles únicos y limpios
-        unique_roles = sorted(set(df["Role"].dropna().apply(clean_role_value)))
+        unique_roles = facet_index.values("Role")
         selected_roles = st.multiselect(
             "👤 Role", 
             unique_roles,
+            key="filter-roles",
+            format_func=with_count("Role"),
             help="Filter by your role in the project"
         )
     else:
         selected_roles = []
 
-# =========================
-# 6. Apply Filters - LÓGICA MEJORADA
-# =========================
-def get_filtered_years(sidebar_years, timeline_year, mode):
-    sidebar_year_list = years if "All" in sidebar_years else [int(y) for y in sidebar_years if y.isdigit()]
-    return sorted(set(sidebar_year_list + [timeline_year])) if mode == "Include timeline year" else sidebar_year_list
-
-final_years = get_filtered_years(selected_years_sidebar, selected_year_slider, filter_mode)
-
-filtered_df = df[df["Year"].isin(final_years)].copy()
-if selected_industries:
-    filtered_df = filtered_df[filtered_df["Industry"].isin(selected_industries)]
-if selected_categories:
-    filtered_df = filtered_df[filtered_df["Category"].isin(selected_categories)]
-if selected_roles and "Role" in filtered_df.columns:
-    # Aplicar limpieza de roles al filtro
-    def clean_role_value(role):
-        if pd.isna(role) or not isinstance(role, str):
-            return "Other"
-        role = role.strip()
-        role_mappings = {
-            'civil engineer': 'Civil Engineer',
-            'ceo': 'CEO',
-            'student': 'Student',
-            'teacher': 'Teacher',
-            'auxiliar / intern': 'Auxiliar / Intern',
-            'project manager': 'Project Manager',
-            'designer / consulter': 'Designer / Consulter',
-        }
-        role_lower = role.lower()
-        for key, value in role_mappings.items():
-            if key in role_lower:
-                return value
-        return role.title() if role else "Other"
-    
-    filtered_df['Role_Clean'] = filtered_df["Role"].apply(clean_role_value)
-    filtered_df = filtered_df[filtered_df["Role_Clean"].isin(selected_roles)]
-
-# Mostrar información del filtro activo
-st.markdown(f"""
-<div class="filter-info">
-    <strong>🔍 Active Filter:</strong> Showing {len(final_years)} year(s): {', '.join(map(str, final_years[:5]))}{'...' if len(final_years) > 5 else ''}
-    <br><small>Timeline: {selected_year_slider} | Mode: {filter_mode}</small>
-</div>
-""", unsafe_allow_html=True)
+sidebar_selections = {
+    "Industry": selected_industries or None,
+    "Category": selected_categories or None,
+    "Role": selected_roles or None,
+}
 
-if not filtered_df.empty:
-    st.success(f"📊 Found **{len(filtered_df)} projects** matching your criteria")
-else:
-    st.warning("❌ No projects found with current filters. Try adjusting your selection.")
+st.title("Projects Dashboard")
 
 # =========================
 # 7. Row: Skills + Logos vs Map
 # =========================
-col1, col2 = st.columns([1, 1])
-
-CLOUDINARY_BASE_URL = "https://res.cloudinary.com/dmf2pbdlq/image/upload/"
-HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
 
 # ✅ IMPROVED: Better color palette with high contrast for skills
 def get_skill_color(skill_name):
@@ -399,42 +361,25 @@ def get_skill_color(skill_name):
     hash_value = int(hashlib.md5(skill_name.encode()).hexdigest(), 16)
     return solid_colors[hash_value % len(solid_colors)]
 
+# Un color por skill distinto, calculado una vez por versión del CSV
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_skill_colors(data_version):
+    skills = dataset.links["Skills"]["Skill"].cat.categories if "Skills" in dataset.links else []
+    return {skill: get_skill_color(skill) for skill in skills}
+
 # Sección Skills - IMPROVED
-with col1:
+def render_skills_and_software(filtered_df):
     st.markdown('<div class="section-header">Skills</div>', unsafe_allow_html=True)
     if not filtered_df.empty and "Skills" in filtered_df.columns:
-        all_skills = set()
-        for skill_list in filtered_df["Skills"].dropna():
-            for skill in str(skill_list).split(","):
-                # ✅ ARREGLADO: Quitar comillas y limpiar skills
-                skill_clean = skill.strip().strip('"\'[]() ').replace('"', '').replace("'", "")
-                if skill_clean:
-                    all_skills.add(skill_clean)
-        
-        skills_list = sorted(all_skills)
+        skills_list = linked_values(dataset.links["Skills"], "Skill", filtered_df.index)
         if skills_list:
-            cols_skills = st.columns(min(len(skills_list), 6))
-            for idx, skill in enumerate(skills_list):
-                color = get_skill_color(skill)  # ✅ Improved high-contrast colors
-                with cols_skills[idx % 6]:
-                    st.markdown(f"""
-                    <div class="skill-badge" style="
-                        background-color: {color}; 
-                        color: white; 
-                        padding: 10px 15px; 
-                        border-radius: 20px; 
-                        text-align: center; 
-                        font-size: 0.9rem; 
-                        font-weight: 700; 
-                        margin: 6px 2px; 
-                        min-width: 90px;
-                        box-shadow: 0 4px 15px rgba(0,0,0,0.2);
-                        border: 2px solid rgba(255,255,255,0.1);
-                        text-shadow: 1px 1px 2px rgba(0,0,0,0.3);
-                        cursor: pointer;
-                    ">
-                        {skill}
-                    </div>""", unsafe_allow_html=True)
+            # Un único elemento HTML con todos los badges (un solo mensaje al navegador)
+            skill_colors = get_skill_colors(load_info["version"])  # ✅ Improved high-contrast colors
+            badges = "".join(
+                f'<div class="skill-badge" style="background-color: {skill_colors.get(skill) or get_skill_color(skill)};">{html.escape(skill)}</div>'
+                for skill in skills_list
+            )
+            st.markdown(f'<div class="skill-grid">{badges}</div>', unsafe_allow_html=True)
         else:
             st.info("No skills available for selected filters.")
     else:
@@ -443,71 +388,67 @@ with col1:
     # Software Logos
     st.markdown('<div class="section-header">Software</div>', unsafe_allow_html=True)
     if not filtered_df.empty and "Software" in filtered_df.columns:
-        all_software = set()
-        for software_list in filtered_df["Software"].dropna():
-            for software in str(software_list).split(","):
-                software_clean = software.strip().strip('"\'[] ').replace(" ", "_").replace("-", "_").lower()
-                if software_clean:
-                    all_software.add(software_clean)
-        software_list = sorted(all_software)
+        software_list = linked_values(dataset.links["Software"], "Software", filtered_df.index)
         if software_list:
-            cols_logos = st.columns(min(len(software_list), 6))
-            for idx, software in enumerate(software_list):
-                urls_to_try = [
-                    f"{CLOUDINARY_BASE_URL}logos/{software}.png",
-                    f"{CLOUDINARY_BASE_URL}logos/{software}.jpg",
-                    f"{CLOUDINARY_BASE_URL}{software}.png",
-                    f"{CLOUDINARY_BASE_URL}{software}.jpg"
-                ]
-                img_url = None
-                success = False
-                for url in urls_to_try:
-                    try:
-                        response = requests.head(url.strip(), timeout=5, headers=HEADERS)
-                        if response.status_code == 200:
-                            img_url = url.strip()
-                            success = True
-                            break
-                    except Exception:
-                        continue
-                with cols_logos[idx % 6]:
-                    if success and img_url:
-                        st.image(img_url, width=80, use_container_width=False, clamp=True, channels="RGB")
-                    else:
-                        st.markdown(f'<div style="font-size: 0.7rem; color: #b0b0b0; text-align: center;">{software}</div>', unsafe_allow_html=True)
+            logo_urls = assets.resolve_logos(software_list)
+            logos = "".join(
+                f'<div><img src="{html.escape(logo_urls[software])}" alt="{html.escape(software)}" title="{html.escape(software)}"></div>'
+                if logo_urls[software] else f'<div class="logo-fallback">{html.escape(software)}</div>'
+                for software in software_list
+            )
+            st.markdown(f'<div class="logo-grid">{logos}</div>', unsafe_allow_html=True)
         else:
             st.info("No software available for selected filters.")
     else:
         st.warning("No 'Software' column found in data.")
 
 # Mapa
-with col2:
+MAP_LEGEND = """<small>🔴 <span style="color: red;">Timeline Year Projects</span> | 🔵 <span style="color: blue;">Other Years</span></small>"""
+
+def render_viewport_map(located, selected_year_slider):
+    """Portafolios grandes: el mapa base queda fijo y solo viaja lo que está
+    en pantalla (más un margen); st_folium devuelve bounds y zoom al moverse."""
+    # Import diferido: streamlit_folium (y folium) solo cargan si se pinta este mapa
+    from streamlit_folium import st_folium
+
+    spatial_index = dataset.spatial_index
+    extent = spatial_index.extent(located)
+    # Un viewport guardado solo vale para el mapa base con el que se reportó
+    view = None
+    if st.session_state.get("project-map-extent") == extent:
+        view = map_view.viewport_from_state(st.session_state.get("project-map"))
+    bounds, zoom = view or (extent, map_view.fit_zoom(extent))
+
+    in_view = spatial_index.select(spatial_index.ids[located], map_view.padded(bounds))
+    highlighted = active_index.is_active(spatial_index.ids[in_view], selected_year_slider)
+    layer, (mode, n_features) = map_view.viewport_layer(dataset.map_features, spatial_index, in_view, zoom, highlighted)
+    st_folium(
+        map_view.base_map(extent), key="project-map", height=600, use_container_width=True,
+        returned_objects=["bounds", "zoom"], feature_group_to_add=layer,
+    )
+    st.session_state["project-map-extent"] = extent
+    caption = f"{len(in_view):,} of {len(located):,} located projects in view"
+    if mode == "cells":
+        caption += f", grouped in {n_features:,} areas: zoom in to see individual projects"
+    st.caption(caption + ".")
+    st.markdown(MAP_LEGEND, unsafe_allow_html=True)
+
+def render_map(filtered_df, selected_year_slider):
     st.markdown('<div class="section-header">Project Locations</div>', unsafe_allow_html=True)
     if not filtered_df.empty and "Latitud" in filtered_df.columns and "Longitud" in filtered_df.columns:
-        valid_locations = filtered_df.dropna(subset=["Latitud", "Longitud"])
-        if not valid_locations.empty:
-            lat_center = valid_locations["Latitud"].mean()
-            lon_center = valid_locations["Longitud"].mean()
-            zoom_start = 12 if len(valid_locations) == 1 else 5
-            map_ = folium.Map(location=[lat_center, lon_center], zoom_start=zoom_start, tiles="CartoDB positron", control_scale=True)
-            for _, row in valid_locations.iterrows():
-                color = "red" if row["Year"] == selected_year_slider else "darkblue"
-                popup_text = f"<b>{row['Project_Name']}</b><br>Year: {int(row['Year'])}"
-                if 'Project_Span' in row and pd.notna(row['Project_Span']):
-                    popup_text += f"<br>Duration: {row['Project_Span']}"
-                if 'Industry' in row:
-                    popup_text += f"<br>Industry: {row.get('Industry', 'N/A')}"
-                folium.Marker(
-                    [row["Latitud"], row["Longitud"]],
-                    popup=folium.Popup(popup_text, max_width=200),
-                    tooltip=f"{row['Project_Name']} ({int(row['Year'])})",
-                    icon=folium.Icon(color=color, icon="map-marker")
-                ).add_to(map_)
-            if len(valid_locations) > 1:
-                bounds = [[row["Latitud"], row["Longitud"]] for _, row in valid_locations.iterrows()]
-                map_.fit_bounds(bounds, padding=(0.1, 0.1))
-            st_folium(map_, height=600, use_container_width=True)
-            st.markdown("""<small>🔴 <span style="color: red;">Timeline Year Projects</span> | 🔵 <span style="color: blue;">Other Years</span></small>""", unsafe_allow_html=True)
+        located = dataset.spatial_index.select(filtered_df.index)
+        if len(located) > map_view.VIEWPORT_THRESHOLD:
+            render_viewport_map(located, selected_year_slider)
+            return
+        # Un punto por proyecto (no uno por año), en rojo si está activo en el año del timeline.
+        # El HTML se reutiliza si ya se pintó esta misma combinación de filtros.
+        map_html = map_view.render_map_html(
+            filtered_df.index, selected_year_slider, load_info["version"], dataset.keys,
+            lambda: map_view.project_points(dataset.map_features, filtered_df.index, active_index.is_active(filtered_df.index, selected_year_slider)),
+        )
+        if map_html is not None:
+            st.iframe(map_html, height=600)
+            st.markdown(MAP_LEGEND, unsafe_allow_html=True)
         else:
             st.warning("No valid coordinates found for selected filters.")
     else:
@@ -516,191 +457,260 @@ with col2:
 # =========================
 # 8. Project Gallery - ARREGLADO: Una imagen única por proyecto considerando duración
 # =========================
-st.markdown('<div class="section-header">Project Gallery</div>', unsafe_allow_html=True)
-if not filtered_df.empty and "image_link" in filtered_df.columns and "Project_Name" in filtered_df.columns:
-    valid_images = filtered_df[filtered_df["image_link"].apply(lambda x: pd.notna(x) and isinstance(x, str) and x.startswith("http"))].copy()
-    if not valid_images.empty:
-        # ✅ ARREGLADO: Considerar proyectos activos en el año seleccionado
-        def is_project_active_in_year(row, target_year):
-            """Verifica si un proyecto está activo en el año objetivo"""
-            if 'Original_Year' in row and 'End_Year' in row:
-                original_year = int(row['Original_Year']) if pd.notna(row['Original_Year']) else int(row['Year'])
-                end_year = int(row['End_Year']) if pd.notna(row['End_Year']) else original_year
-                return original_year <= target_year <= end_year
-            return int(row['Year']) == target_year
-        
-        # Obtener proyectos únicos
-        unique_images = valid_images.drop_duplicates(subset='Project_Name', keep='first')
+def gallery_caption(row, star=False):
+    caption_text = f"⭐ {row['Project_Name']}" if star else f"{row['Project_Name']}"
+    if 'Duration_Display' in row and pd.notna(row['Duration_Display']):
+        caption_text += f" [{row['Duration_Display']}]"
+    elif 'Project_Span' in row and pd.notna(row['Project_Span']):
+        caption_text += f" [{row['Project_Span']}]"
+    else:
+        caption_text += f" ({int(row['Year'])})"
+    return caption_text
+
+def fill_gallery_card(slot, row, image_url, available, star=False):
+    if not available:
+        slot.markdown('<div class="image-placeholder">🖼️ Not Available</div>', unsafe_allow_html=True)
+        return
+    with slot.container():
+        # Miniatura de Cloudinary (ancho limitado, calidad/formato automáticos), no el original
+        st.image(assets.thumbnail_url(image_url), caption=gallery_caption(row, star), use_container_width=True, clamp=True, channels="RGB")
+        if "Blog_Link" in row and pd.notna(row["Blog_Link"]):
+            st.markdown(f"[📖 More Information]({row['Blog_Link']})", unsafe_allow_html=True)
+
+def render_gallery_grid(rows, pending, star=False):
+    """Pinta al instante las tarjetas cuyo enlace ya se validó; el resto queda
+    en `pending` para validarse en un único lote concurrente."""
+    cols = st.columns(4)
+    for i, (_, row) in enumerate(rows.iterrows()):
+        with cols[i % 4]:
+            image_url = row["image_link"].strip()
+            slot = st.empty()
+            available = assets.cached_status(image_url)
+            if available is None:
+                slot.markdown('<div class="image-placeholder">⏳ Loading...</div>', unsafe_allow_html=True)
+                pending.append((slot, row, image_url, star))
+            else:
+                fill_gallery_card(slot, row, image_url, available, star)
+
+GALLERY_PAGE_SIZE = 16
+
+def set_gallery_page(page):
+    st.session_state["gallery-page"] = page
+
+def render_gallery(filtered_df, selected_year_slider):
+    st.markdown('<div class="section-header">Project Gallery</div>', unsafe_allow_html=True)
+    if not filtered_df.empty and "image_link" in filtered_df.columns and "Project_Name" in filtered_df.columns:
+        valid_images = filtered_df[filtered_df["image_link"].apply(lambda x: pd.notna(x) and isinstance(x, str) and x.startswith("http"))]
+        if not valid_images.empty:
+            # Obtener proyectos únicos
+            unique_images = valid_images.drop_duplicates(subset='Project_Name', keep='first')
         
-        # ✅ Clasificar proyectos según si están activos en el año del timeline
-        timeline_projects = unique_images[unique_images.apply(lambda row: is_project_active_in_year(row, selected_year_slider), axis=1)]
-        other_projects = unique_images[~unique_images.apply(lambda row: is_project_active_in_year(row, selected_year_slider), axis=1)]
+            # ✅ Clasificar proyectos según si están activos en el año del timeline
+            is_timeline = active_index.is_active(unique_images.index, selected_year_slider)
+            timeline_projects = unique_images[is_timeline]
+            other_projects = unique_images[~is_timeline]
         
-        shuffled_others = other_projects.sample(frac=1, random_state=42).reset_index(drop=True)
-
-        if not timeline_projects.empty:
-            st.markdown(f"### 🎯 Projects Active in {selected_year_slider}")
-            cols_timeline = st.columns(4)
-            for i, (_, row) in enumerate(timeline_projects.head(8).iterrows()):
-                col = cols_timeline[i % 4]
-                with col:
-                    image_url = row["image_link"].strip()
-                    try:
-                        if requests.head(image_url, timeout=5, headers=HEADERS).status_code == 200:
-                            caption_text = f"⭐ {row['Project_Name']}"
-                            if 'Duration_Display' in row and pd.notna(row['Duration_Display']):
-                                caption_text += f" [{row['Duration_Display']}]"
-                            elif 'Project_Span' in row and pd.notna(row['Project_Span']):
-                                caption_text += f" [{row['Project_Span']}]"
-                            else:
-                                caption_text += f" ({int(row['Year'])})"
-                            
-                            st.image(image_url, caption=caption_text, use_container_width=True, clamp=True, channels="RGB")
-                            if "Blog_Link" in row and pd.notna(row["Blog_Link"]):
-                                st.markdown(f"[📖 More Information]({row['Blog_Link']})", unsafe_allow_html=True)
-                        else:
-                            st.markdown('<div class="image-placeholder">🖼️ Not Available</div>', unsafe_allow_html=True)
-                    except Exception:
-                        st.markdown('<div class="image-placeholder">⚠️ Error</div>', unsafe_allow_html=True)
-
-        if not shuffled_others.empty:
-            st.markdown("### 📸 Other Projects")
-            per_page = 8
-            cols1 = st.columns(4)
-            for i, (_, row) in enumerate(shuffled_others.head(per_page).iterrows()):
-                col = cols1[i % 4]
-                with col:
-                    image_url = row["image_link"].strip()
-                    try:
-                        if requests.head(image_url, timeout=5, headers=HEADERS).status_code == 200:
-                            caption_text = f"{row['Project_Name']}"
-                            if 'Duration_Display' in row and pd.notna(row['Duration_Display']):
-                                caption_text += f" [{row['Duration_Display']}]"
-                            elif 'Project_Span' in row and pd.notna(row['Project_Span']):
-                                caption_text += f" [{row['Project_Span']}]"
-                            else:
-                                caption_text += f" ({int(row['Year'])})"
-                            
-                            st.image(image_url, caption=caption_text, use_container_width=True, clamp=True, channels="RGB")
-                            if "Blog_Link" in row and pd.notna(row["Blog_Link"]):
-                                st.markdown(f"[📖 More Information]({row['Blog_Link']})", unsafe_allow_html=True)
-                        else:
-                            st.markdown('<div class="image-placeholder">🖼️ Not Available</div>', unsafe_allow_html=True)
-                    except Exception:
-                        st.markdown('<div class="image-placeholder">⚠️ Error</div>', unsafe_allow_html=True)
-
-            if len(shuffled_others) > per_page and st.button("🔍 Load More Projects"):
-                st.markdown("### Additional Projects")
-                more_images = shuffled_others.iloc[per_page:per_page*2]
-                cols2 = st.columns(4)
-                for i, (_, row) in enumerate(more_images.iterrows()):
-                    col = cols2[i % 4]
-                    with col:
-                        image_url = row["image_link"].strip()
-                        try:
-                            if requests.head(image_url, timeout=5, headers=HEADERS).status_code == 200:
-                                caption_text = f"{row['Project_Name']}"
-                                if 'Duration_Display' in row and pd.notna(row['Duration_Display']):
-                                    caption_text += f" [{row['Duration_Display']}]"
-                                elif 'Project_Span' in row and pd.notna(row['Project_Span']):
-                                    caption_text += f" [{row['Project_Span']}]"
-                                else:
-                                    caption_text += f" ({int(row['Year'])})"
-                                
-                                st.image(image_url, caption=caption_text, use_container_width=True, clamp=True, channels="RGB")
-                                if "Blog_Link" in row and pd.notna(row["Blog_Link"]):
-                                    st.markdown(f"[📖 More Information]({row['Blog_Link']})", unsafe_allow_html=True)
-                            else:
-                                st.markdown('<div class="image-placeholder">🖼️ Not Available</div>', unsafe_allow_html=True)
-                        except Exception:
-                            st.markdown('<div class="image-placeholder">⚠️ Error</div>', unsafe_allow_html=True)
+            shuffled_others = other_projects.sample(frac=1, random_state=42)
+
+            # Una sola lista paginada: primero los activos en el año del timeline (⭐).
+            # La página vive en session_state; con otros filtros vuelve a la primera.
+            items = pd.concat([timeline_projects, shuffled_others])
+            n_pages = -(-len(items) // GALLERY_PAGE_SIZE)
+            signature = f"{selected_year_slider}-" + hashlib.sha1(items.index.to_numpy(dtype=np.int64).tobytes()).hexdigest()
+            if st.session_state.get("gallery-signature") != signature:
+                st.session_state["gallery-signature"] = signature
+                st.session_state["gallery-page"] = 0
+            page = min(max(st.session_state.get("gallery-page", 0), 0), n_pages - 1)
+            start = page * GALLERY_PAGE_SIZE
+            page_items = items.iloc[start:start + GALLERY_PAGE_SIZE]
+            featured = page_items.iloc[:max(len(timeline_projects) - start, 0)]
+            others = page_items.iloc[len(featured):]
+            pending_cards = []
+
+            if not featured.empty:
+                st.markdown(f"### 🎯 Projects Active in {selected_year_slider}")
+                render_gallery_grid(featured, pending_cards, star=True)
+
+            if not others.empty:
+                st.markdown("### 📸 Other Projects")
+                render_gallery_grid(others, pending_cards)
+
+            if pending_cards:
+                available = assets.check_urls([image_url for _, _, image_url, _ in pending_cards])
+                for slot, row, image_url, star in pending_cards:
+                    fill_gallery_card(slot, row, image_url, available[image_url], star)
+
+            # Mientras se mira esta página, la siguiente se valida en segundo plano
+            next_items = items.iloc[start + GALLERY_PAGE_SIZE:start + 2 * GALLERY_PAGE_SIZE]
+            assets.prefetch([image_url.strip() for image_url in next_items["image_link"]])
+
+            if n_pages > 1:
+                prev_col, info_col, next_col = st.columns([1, 2, 1])
+                prev_col.button("◀ Previous", key="gallery-prev", disabled=page == 0,
+                                on_click=set_gallery_page, args=(page - 1,))
+                info_col.markdown(
+                    f'<div style="text-align: center;">Page {page + 1} of {n_pages} · {len(items)} projects</div>',
+                    unsafe_allow_html=True,
+                )
+                next_col.button("Next ▶", key="gallery-next", disabled=page == n_pages - 1,
+                                on_click=set_gallery_page, args=(page + 1,))
+        else:
+            st.info("No valid image links available for selected filters.")
     else:
-        st.info("No valid image links available for selected filters.")
-else:
-    st.warning("No projects found with current filter selection.")
+        st.warning("No projects found with current filter selection.")
 
 # =========================
 # 9. Data Table - ARREGLADO: Incluir Scope of Work y Duration
 # =========================
-st.markdown('<div class="section-header">Project Details</div>', unsafe_allow_html=True)
-# ✅ ARREGLADO: Incluir Scope_of_work y Duration en la tabla
-base_cols = ["Project_Name", "Year", "Role"]
-optional_cols = ["Scope_of_work", "Duration_Display", "Functions", "Client_Company", "Country"]
-show_cols = base_cols + [col for col in optional_cols if col in filtered_df.columns]
-
-if not filtered_df.empty and show_cols:
-    if 'Original_Year' in filtered_df.columns:
-        unique_df = filtered_df.sort_values('Original_Year').drop_duplicates(subset='Project_Name', keep='first')
+def render_details(filtered_df, selected_year_slider, selections, ranked):
+    st.markdown('<div class="section-header">Project Details</div>', unsafe_allow_html=True)
+    # ✅ ARREGLADO: Incluir Scope_of_work y Duration en la tabla
+    base_cols = ["Project_Name", "Year", "Role"]
+    optional_cols = ["Scope_of_work", "Duration_Display", "Functions", "Client_Company", "Country"]
+    show_cols = base_cols + [col for col in optional_cols if col in filtered_df.columns]
+
+    if not filtered_df.empty and show_cols:
+        # Una fila por proyecto con el año original; ⭐ si alguna de sus fases está activa en el año
+        # seleccionado, la misma regla con la que cuentan las métricas
+        display_df = details_table(filtered_df, show_cols, active_index, selected_year_slider, ranked=ranked)
+        st.dataframe(display_df, use_container_width=True, height=400)
+
+        # Métricas: consultas al cubo precalculado en la ingesta (con búsqueda, sobre las filas)
+        if ranked:
+            metrics = project_metrics(filtered_df, active_index, selected_year_slider)
+        else:
+            metrics = dataset.cube.metrics(selections, selected_year_slider)
+        col_stats1, col_stats2, col_stats3, col_stats4 = st.columns(4)
+        with col_stats1:
+            st.metric("Unique Projects", metrics["unique_projects"])
+        with col_stats2:
+            st.metric(f"Active in {selected_year_slider}", metrics["active_in_year"],
+                      help="Projects with any phase active that year: the ⭐ rows in the table.")
+        with col_stats3:
+            year_range = "{}-{}".format(*metrics["year_range"]) if metrics["year_range"] else "-"
+            st.metric("Project Year Range", year_range)
+        with col_stats4:
+            st.metric("Multi-Year Projects", metrics["multi_year"],
+                      help="Projects with any phase spanning more than one calendar year.")
     else:
-        unique_df = filtered_df.drop_duplicates(subset='Project_Name', keep='first')
-    
-    display_df = unique_df[show_cols].copy()
-    
-    # Asegurar que Year sea del año original
-    if 'Original_Year' in unique_df.columns:
-        display_df["Year"] = unique_df["Original_Year"].astype(int)
+        st.info("No data to display with current filters.")
+
+# =========================
+# 6. Timeline + Apply Filters - fragmento
+# =========================
+@st.fragment
+@instrumentation.profiled("6 timeline", session=session_id)
+def timeline_dashboard(selected_years_sidebar, sidebar_selections, search_scores):
+    """El slider y el modo viven dentro del fragmento: moverlos solo re-ejecuta
+    filtros, mapa, galería y tabla, no la carga de datos ni la barra lateral."""
+    filter_col1, filter_col2 = st.columns([2, 1])
+    with filter_col1:
+        selected_year_slider = st.slider(
+            "Select a specific year to highlight",
+            min_value=min_year,
+            max_value=max_year,
+            value=max_year,
+            key="timeline-slider",
+            help="This will be included in the filter along with sidebar selections"
+        )
+
+    with filter_col2:
+        filter_mode = st.radio(
+            "Filter Mode:",
+            options=["Include timeline year", "Only sidebar selection"],
+            index=0,
+            help="Choose how to combine timeline and sidebar filters"
+        )
+
+    with instrumentation.stage("6 apply filters"):
+        final_years = get_filtered_years(selected_years_sidebar, selected_year_slider, filter_mode)
+        selections = {"Year": final_years, **sidebar_selections}
+        mask = facet_index.resolve(selections)
+        if search_scores is not None:
+            # Búsqueda: intersección con los filtros, más relevantes primero
+            mask &= search_scores > 0
+        filtered_df = projects[mask]
+        if search_scores is not None:
+            filtered_df = filtered_df.iloc[np.argsort(-search_scores[filtered_df.index.to_numpy()], kind="stable")]
+
+    # Mostrar información del filtro activo
+    st.markdown(f"""
+    <div class="filter-info">
+        <strong>🔍 Active Filter:</strong> Showing {len(final_years)} year(s): {', '.join(map(str, final_years[:5]))}{'...' if len(final_years) > 5 else ''}
+        <br><small>Timeline: {selected_year_slider} | Mode: {filter_mode}</small>
+    </div>
+    """, unsafe_allow_html=True)
+
+    if not filtered_df.empty:
+        st.success(f"📊 Found **{len(filtered_df)} projects** matching your criteria")
     else:
-        display_df["Year"] = unique_df["Year"].astype(int)
-
-    # ✅ Limpieza de la columna Role
-    def clean_role(role):
-        if pd.isna(role) or not isinstance(role, str):
-            return "Other"
-        role = role.strip()
-        role_mappings = {
-            'civil engineer': 'Civil Engineer',
-            'ceo': 'CEO',
-            'student': 'Student',
-            'teacher': 'Teacher',
-            'auxiliar / intern': 'Auxiliar / Intern',
-            'project manager': 'Project Manager',
-            'designer / consulter': 'Designer / Consulter',
-        }
-        role_lower = role.lower()
-        for key, value in role_mappings.items():
-            if key in role_lower:
-                return value
-        return role.title() if role else "Other"
-
-    if "Role" in display_df.columns:
-        display_df["Role"] = display_df["Role"].apply(clean_role)
-
-    # Añadir ⭐ si está activo en el año seleccionado
-    def is_active_in_timeline(row):
-        if 'Original_Year' in row and 'End_Year' in row:
-            try:
-                original_year = int(row['Original_Year']) if pd.notna(row['Original_Year']) else int(row['Year'])
-                end_year = int(row['End_Year']) if pd.notna(row['End_Year']) else original_year
-                return original_year <= selected_year_slider <= end_year
-            except:
-                pass
-        return int(row["Year"]) == selected_year_slider
-
-    display_df["Year"] = display_df.apply(
-        lambda row: f"⭐ {int(row['Year'])}" if is_active_in_timeline(row) else str(int(row['Year'])), axis=1
+        st.warning("❌ No projects found with current filters. Try adjusting your selection.")
+
+    # Mapa y galería (lentos) quedan como placeholders en su lugar del layout;
+    # se pintan después de skills, tabla y métricas, que son baratos
+    col1, col2 = st.columns([1, 1])
+    map_slot = col2.empty()
+    map_slot.caption("🗺️ Loading map...")
+    gallery_slot = st.empty()
+    gallery_slot.caption("📸 Loading gallery...")
+    with col1, instrumentation.stage("7 skills + software"):
+        render_skills_and_software(filtered_df)
+    with instrumentation.stage("9 details"):
+        render_details(filtered_df, selected_year_slider, selections, ranked=search_scores is not None)
+    with map_slot.container(), instrumentation.stage("7 map"):
+        render_map(filtered_df, selected_year_slider)
+    with gallery_slot.container(), instrumentation.stage("8 gallery"):
+        render_gallery(filtered_df, selected_year_slider)
+
+timeline_dashboard(selected_years_sidebar, sidebar_selections, search_scores)
+instrumentation.finish_rerun()
+
+# =========================
+# 10. Debug panel (?debug=1)
+# =========================
+def summarize_http(http):
+    return ", ".join(
+        f"{host}: {h['requests']} req, max {max(h['latencies_ms'])} ms" + (f", {h['failures']} failed" if h["failures"] else "")
+        for host, h in http.items()
     )
 
-    # ✅ Renombrar columnas para mejor presentación
-    column_renames = {
-        "Scope_of_work": "Scope of Work",
-        "Duration_Display": "Duration",
-        "Client_Company": "Client"
-    }
-    display_df = display_df.rename(columns={k: v for k, v in column_renames.items() if k in display_df.columns})
-
-    st.dataframe(display_df, use_container_width=True, height=400)
-
-    col_stats1, col_stats2, col_stats3, col_stats4 = st.columns(4)
-    with col_stats1:
-        st.metric("Unique Projects", len(unique_df))
-    with col_stats2:
-        active_count = display_df[display_df["Year"].str.contains("⭐", na=False)].shape[0]
-        st.metric(f"Active in {selected_year_slider}", active_count)
-    with col_stats3:
-        year_range = f"{unique_df['Original_Year'].min():.0f}-{unique_df['Original_Year'].max():.0f}" if 'Original_Year' in unique_df.columns else f"{unique_df['Year'].min():.0f}-{unique_df['Year'].max():.0f}"
-        st.metric("Project Year Range", year_range)
-    with col_stats4:
-        multi_year = unique_df[unique_df['Project_Span'].str.contains('-', na=False)].shape[0] if 'Project_Span' in unique_df.columns else 0
-        st.metric("Multi-Year Projects", multi_year)
-else:
-    st.info("No data to display with current filters.")
+def render_debug_panel():
+    """Tiempos por sección de los últimos reruns de esta sesión, estado de las
+    cachés y del cliente HTTP, y export en JSON lines."""
+    records = [r for r in instrumentation.recent if r["session"] == session_id()]
+    with st.sidebar.expander("🛠️ Profiling", expanded=True):
+        if records:
+            last = records[-1]
+            st.caption(f"Last rerun ({last['kind']}): {last['total_ms']:.0f} ms")
+            st.dataframe(pd.DataFrame([
+                {
+                    "stage": entry["stage"],
+                    "calls": entry["calls"],
+                    "wall_ms": entry["wall_ms"],
+                    "end_ms": entry.get("end_ms"),
+                    "cache": ", ".join(f"{cache} {counts}" for cache, counts in entry["cache"].items()),
+                    "http": summarize_http(entry["http"]),
+                }
+                for entry in last["stages"]
+            ]), hide_index=True)
+            st.markdown(f"**p50 / p95 over {len(records)} reruns**")
+            st.dataframe(pd.DataFrame(instrumentation.percentiles(records)).T)
+            st.download_button(
+                "Export JSON lines",
+                "\n".join(json.dumps(record) for record in records),
+                file_name="dashboard-profile.jsonl",
+                mime="application/jsonl",
+            )
+        st.markdown("**HTTP client**")
+        st.json(http_client.client.stats(), expanded=False)
+        st.markdown("**Caches**")
+        st.json({
+            "data": loader.get_load_info(data_url),
+            "dataset": dataset_store()["refresh"],
+            "map": map_view.map_cache.stats(),
+            "urls": len(assets.url_cache),
+            "shared": shared_cache.cache.stats(),
+        }, expanded=False)
+
+if st.query_params.get("debug") == "1":
+    render_debug_panel()
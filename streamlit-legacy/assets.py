@@ -0,0 +1,189 @@
+"""Availability checks for Cloudinary logos and images.
+
+HEAD probes run concurrently and their results, positive or negative, are
+cached per URL, in process and in ``shared_cache`` for the other workers on
+the host, so steady-state reruns make no HTTP requests at all. ``prefetch``
+runs the same checks in the background, ahead of the rerun that needs them.
+
+``thumbnail_url`` rewrites a Cloudinary upload URL into a resized, recompressed
+delivery URL; availability is still checked on the original.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+import shared_cache
+from http_client import CircuitOpenError, client
+
+CLOUDINARY_BASE_URL = os.environ.get("CLOUDINARY_BASE_URL", "https://res.cloudinary.com/dmf2pbdlq/image/upload/")
+
+HEAD_TIMEOUT_SECONDS = 5
+# One retry on a 5xx or network error, within the client's retry budget; 404s are final
+HEAD_RETRIES = 1
+MAX_WORKERS = 8
+POSITIVE_TTL_SECONDS = 24 * 3600
+NEGATIVE_TTL_SECONDS = 3600
+
+# Gallery cards are a quarter of the wide layout; twice that for dense screens
+THUMBNAIL_WIDTH = 480
+_CLOUDINARY_UPLOAD = re.compile(r"^(https?://res\.cloudinary\.com/[^/]+/image/upload/)(.+)$")
+# A transformation segment ("w_300,c_fill,q_auto") is a comma-separated list of Cloudinary
+# parameters, each with a value of the right shape; anything else ("v123", "my_folder") is not
+_NUMBER = r"(?:auto|\d+(?:\.\d+)?|\d*\.\d+)"
+_TRANSFORMATION_PARAMETER = (
+    rf"(?:[whxy]_{_NUMBER}|dpr_{_NUMBER}|ar_\d+(?:\.\d+)?(?::\d+(?:\.\d+)?)?|[ao]_-?\d+|z_{_NUMBER}|r_(?:\d+|max)"
+    r"|q_(?:auto(?::\w+)?|\d{1,3})|f_(?:auto|jpe?g|png|webp|avif|gif|svg|bmp|tiff?)"
+    r"|c_(?:fill|lfill|fill_pad|fit|limit|mfit|pad|lpad|mpad|scale|thumb|crop|auto|imagga_crop|imagga_scale)"
+    r"|g_(?:auto|center|faces?|north|south|east|west|north_east|north_west|south_east|south_west)(?::\w+)?"
+    r"|e_[a-z_]+(?::[-\w]+)*|t_[\w-]+|fl_[\w.:]+|b_(?:auto|rgb:[0-9a-fA-F]{3,8}|[a-z]+))"
+)
+_TRANSFORMATION = re.compile(rf"^{_TRANSFORMATION_PARAMETER}(?:,{_TRANSFORMATION_PARAMETER})*$")
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire; the least recently used
+    entries are evicted beyond ``max_entries``."""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at < time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+url_cache = TTLCache()
+
+
+def _probe(url):
+    """True/False, or None when the host's circuit breaker is open."""
+    try:
+        return client.head(url, timeout=HEAD_TIMEOUT_SECONDS, retries=HEAD_RETRIES).status_code == 200
+    except CircuitOpenError:
+        return None
+    except Exception:
+        return False
+
+
+def cached_status(url):
+    """True/False if ``url`` was checked recently, None if it still needs a probe."""
+    return url_cache.get(url)
+
+
+def check_urls(urls):
+    """Returns ``{url: available}``, probing uncached URLs concurrently."""
+    results = {}
+    pending = []
+    for url in dict.fromkeys(urls):
+        cached = url_cache.get(url)
+        if cached is None:
+            pending.append(url)
+        else:
+            instrumentation.cache_event("urls", "hit")
+            results[url] = cached
+    if pending:
+        shared = shared_cache.cache.get_many("urls", pending)
+        for url, ok in shared.items():
+            instrumentation.cache_event("urls", "shared")
+            url_cache.set(url, ok, POSITIVE_TTL_SECONDS if ok else NEGATIVE_TTL_SECONDS)
+            results[url] = ok
+        pending = [url for url in pending if url not in shared]
+    if pending:
+        probed = {}
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(pending))) as pool:
+            for url, ok in zip(pending, pool.map(instrumentation.propagate(_probe), pending)):
+                instrumentation.cache_event("urls", "miss")
+                # A short-circuited probe says nothing about the URL: don't cache it
+                if ok is not None:
+                    url_cache.set(url, ok, POSITIVE_TTL_SECONDS if ok else NEGATIVE_TTL_SECONDS)
+                    probed[url] = ok
+                results[url] = bool(ok)
+        for ok in (True, False):
+            shared_cache.cache.set_many(
+                "urls", {url: v for url, v in probed.items() if v is ok},
+                ttl=POSITIVE_TTL_SECONDS if ok else NEGATIVE_TTL_SECONDS,
+            )
+    return results
+
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def prefetch(urls):
+    """Starts checking the uncached ``urls`` in the background and returns at
+    once; a later ``check_urls`` or ``cached_status`` finds them in the cache."""
+    with _in_flight_lock:
+        pending = [url for url in dict.fromkeys(urls) if url not in _in_flight and url_cache.get(url) is None]
+        _in_flight.update(pending)
+    if not pending:
+        return None
+
+    def run():
+        try:
+            check_urls(pending)
+        finally:
+            with _in_flight_lock:
+                _in_flight.difference_update(pending)
+    return _prefetch_pool.submit(run)
+
+
+def thumbnail_url(url, width=THUMBNAIL_WIDTH):
+    """``url`` delivered at most ``width`` px wide, with automatic quality and
+    format, when it is a plain Cloudinary upload URL; other URLs unchanged."""
+    match = _CLOUDINARY_UPLOAD.match(url)
+    if match is None:
+        return url
+    prefix, path = match.groups()
+    first, _, rest = path.partition("/")
+    if rest and _TRANSFORMATION.match(first):
+        return url  # already transformed: keep the author's choice
+    return f"{prefix}w_{width},c_limit,q_auto,f_auto/{path}"
+
+
+def logo_candidates(software):
+    return [
+        f"{CLOUDINARY_BASE_URL}logos/{software}.png",
+        f"{CLOUDINARY_BASE_URL}logos/{software}.jpg",
+        f"{CLOUDINARY_BASE_URL}{software}.png",
+        f"{CLOUDINARY_BASE_URL}{software}.jpg",
+    ]
+
+
+def resolve_logos(software_names):
+    """Maps each software name to its first available logo URL, or None.
+
+    All candidates of all names are probed in one concurrent batch.
+    """
+    candidates = {name: logo_candidates(name) for name in software_names}
+    available = check_urls([url for urls in candidates.values() for url in urls])
+    return {name: next((url for url in urls if available[url]), None) for name, urls in candidates.items()}
@@ -0,0 +1,111 @@
+"""Benchmarks pipeline.expand_projects_by_duration against the old iterrows loop.
+
+    python benchmarks/bench_expand.py            # 10k and 1M rows
+    python benchmarks/bench_expand.py --full     # also run the legacy loop on 1M rows
+
+The legacy loop needs several minutes at 1M rows, so by default it is timed
+on a 20k-row sample and scaled linearly.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import expand_projects_by_duration  # noqa: E402
+
+LEGACY_SAMPLE_ROWS = 20_000
+
+
+def legacy_expand_projects_by_duration(df):
+    """The pre-vectorization implementation, kept verbatim for comparison."""
+    if df.empty: return df
+
+    duration_col = next((col for col in ['Duration_Months', 'Duration', 'Months', 'Project_Duration'] if col in df.columns), None)
+    if not duration_col: return df
+
+    expanded_rows = []
+    for _, row in df.iterrows():
+        try:
+            duration_months = row[duration_col]
+            if pd.isna(duration_months) or duration_months <= 0:
+                expanded_rows.append(row.copy())
+                continue
+            duration_months = int(float(duration_months))
+            start_year = int(row['Year'])
+            end_year = start_year + (duration_months // 12)
+            years_affected = list(range(start_year, end_year + 1))
+
+            for year in years_affected:
+                new_row = row.copy()
+                new_row['Year'] = year
+                new_row['Original_Year'] = start_year
+                new_row['End_Year'] = end_year
+                new_row['Project_Span'] = f"{start_year}-{end_year}" if len(years_affected) > 1 else str(start_year)
+                new_row['Duration_Display'] = f"{duration_months} months ({start_year}-{end_year})" if len(years_affected) > 1 else f"{duration_months} months"
+                expanded_rows.append(new_row)
+        except:
+            expanded_rows.append(row.copy())
+    return pd.DataFrame(expanded_rows)
+
+
+def make_frame(rows, seed=0, missing_years=False):
+    rng = np.random.default_rng(seed)
+    durations = rng.choice([np.nan, 0, 3, 6, 12, 18, 24, 36, 60], size=rows)
+    years = rng.integers(2008, 2025, size=rows)
+    if missing_years:
+        # Rows the loader would drop; the function must still pass them through
+        years = np.where(rng.random(rows) < 0.1, np.nan, years)
+    return pd.DataFrame({
+        "Project_Name": [f"Project {i}" for i in range(rows)],
+        "Scope of work": "Formulation of a new Territorial Zoning Plan",
+        "Role": '["Civil Engineer"]',
+        "Duration_Months": durations,
+        "Year": years,
+        "Latitud": rng.uniform(-4, 12, size=rows),
+        "Longitud": rng.uniform(-79, -67, size=rows),
+    })
+
+
+def timed(fn, df):
+    start = time.perf_counter()
+    result = fn(df)
+    return time.perf_counter() - start, result
+
+
+def check_equivalent(df):
+    """The vectorized engine must produce the same per-year rows."""
+    cols = ["Project_Name", "Year", "Original_Year", "End_Year", "Project_Span", "Duration_Display"]
+    new = expand_projects_by_duration(df)[cols].reset_index(drop=True)
+    old = legacy_expand_projects_by_duration(df)[cols].reset_index(drop=True)
+    pd.testing.assert_frame_equal(new.astype(str), old.astype(str), check_dtype=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--full", action="store_true", help="never sample the legacy loop")
+    args = parser.parse_args()
+
+    check_equivalent(make_frame(2_000, seed=1))
+    check_equivalent(make_frame(2_000, seed=2, missing_years=True))
+
+    print(f"{'rows':>10} {'out rows':>10} {'vectorized':>12} {'legacy':>12} {'speedup':>9}")
+    for rows in args.sizes:
+        df = make_frame(rows)
+        new_time, result = timed(expand_projects_by_duration, df)
+        if args.full or rows <= LEGACY_SAMPLE_ROWS:
+            old_time, _ = timed(legacy_expand_projects_by_duration, df)
+            note = ""
+        else:
+            sample_time, _ = timed(legacy_expand_projects_by_duration, df.head(LEGACY_SAMPLE_ROWS))
+            old_time = sample_time * rows / LEGACY_SAMPLE_ROWS
+            note = " (extrapolated)"
+        print(f"{rows:>10} {len(result):>10} {new_time:>11.3f}s {old_time:>11.3f}s {old_time / new_time:>8.0f}x{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""Concurrent viewers: rerun latency, memory and CPU with N simultaneous sessions.
+
+    python benchmarks/bench_load.py                              # 1, 4, 16 sessions
+    python benchmarks/bench_load.py --sessions 8 32 --rows 10000 --actions 30
+    python benchmarks/bench_load.py --think 0 --output load.json  # no think time: saturation
+
+Every session is a Streamlit ``AppTest`` of app.py running in its own
+thread of this process, which is how one Streamlit server runs its
+sessions: module imports, ``st.cache_resource`` and the in-process caches
+are shared, the GIL and the CPU too. Each session renders the page, then
+performs ``--actions`` interactions drawn from a viewer's usual mix
+(scrubbing the timeline slider year by year, picking industries, roles
+and years in the sidebar, switching the filter mode, paging through the
+gallery), waiting an exponential think time of mean ``--think`` seconds
+between them. AppTest has no fragment reruns, so every interaction
+reruns the whole script: the timeline latencies are an upper bound.
+
+The sheet comes from ``synthetic.py`` and is served, with the Cloudinary
+HEAD probes, by a local ``stub_server``; the shared cross-process cache is
+disabled. A warm-up session runs first, so sweeps measure a warm server.
+Per sweep the report gives p50/p99 latency of first renders and of
+interactions (overall, per action and per profiled stage), reruns/s,
+resident memory added per session, and CPU use sampled every 0.2 s as a
+share of the cores available to the process.
+"""
+import argparse
+import collections
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+APP_FILE = os.path.join(APP_DIR, "app.py")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, HERE)
+
+# Before the app modules are imported: no shared cache, no stray snapshots
+os.environ["DASHBOARD_SHARED_CACHE"] = ""
+os.environ.setdefault("DASHBOARD_CACHE_DIR", tempfile.mkdtemp(prefix="bench-load-"))
+warnings.filterwarnings("ignore")
+
+import numpy as np  # noqa: E402
+import streamlit.logger  # noqa: E402
+from streamlit import config  # noqa: E402
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1 import app_test, local_script_runner  # noqa: E402
+
+import assets  # noqa: E402
+import instrumentation  # noqa: E402
+import loader  # noqa: E402
+import synthetic  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+DEFAULT_SESSIONS = [1, 4, 16]
+SAMPLE_SECONDS = 0.2
+# How often a viewer does each thing; scrubbing is by far the most common
+ACTIONS = {"scrub": 5, "industry": 2, "role": 1, "years": 1, "mode": 1, "gallery_page": 1}
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def pct(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 1) if len(values) else None
+
+
+class Sampler(threading.Thread):
+    """Samples process CPU time and RSS until stopped."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        last_wall, last_cpu = time.perf_counter(), time.process_time()
+        while not self._done.wait(SAMPLE_SECONDS):
+            wall, cpu = time.perf_counter(), time.process_time()
+            self.samples.append(((cpu - last_cpu) / (wall - last_wall), rss_bytes()))
+            last_wall, last_cpu = wall, cpu
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def share_runtime():
+    """AppTest installs a mock Runtime singleton for each run and removes it
+    when the run ends, which breaks any run still going in another thread,
+    and compiles the script once per run (concurrent ``ast.parse`` calls are
+    not thread-safe on Python 3.11). Keep the first runtime and a single
+    script cache for the whole process instead, as a server does for all its
+    sessions."""
+    original = Runtime.instance.__func__
+    shared = []
+
+    def instance(cls):
+        if not shared:
+            shared.append(original(cls))
+        return shared[0]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: bool(shared) or cls._instance is not None)
+    script_cache = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+
+def rerun(at, action, latencies):
+    start = time.perf_counter()
+    at.run()
+    latencies.append((action, time.perf_counter() - start))
+    if at.exception:
+        raise RuntimeError(f"{action}: {at.exception[0].value}")
+
+
+def option_values(widget):
+    # Multiselect options are shown as "value (count)"
+    return [option.rsplit(" (", 1)[0] for option in widget.options]
+
+
+def interact(at, action, rng, latencies):
+    """Performs one viewer action on ``at`` (one or more reruns)."""
+    if action == "scrub":
+        slider = at.slider(key="timeline-slider")
+        step = rng.choice([-1, 1])
+        for _ in range(rng.integers(2, 6)):
+            value = slider.value + step
+            if not slider.min <= value <= slider.max:
+                step = -step
+                value = slider.value + step
+            slider.set_value(value)
+            rerun(at, action, latencies)
+            slider = at.slider(key="timeline-slider")
+    elif action in ("industry", "role"):
+        widget = at.multiselect(key="filter-industries" if action == "industry" else "filter-roles")
+        if widget.value:
+            widget.set_value([])
+        else:
+            options = option_values(widget)
+            widget.set_value(list(rng.choice(options, size=min(len(options), rng.integers(1, 3)), replace=False)))
+        rerun(at, action, latencies)
+    elif action == "years":
+        widget = at.multiselect(key="filter-years")
+        if widget.value != ["All"]:
+            widget.set_value(["All"])
+        else:
+            years = [value for value in option_values(widget) if value != "All"]
+            widget.set_value(sorted(rng.choice(years, size=min(len(years), 3), replace=False)))
+        rerun(at, action, latencies)
+    elif action == "mode":
+        radio = at.radio[0]
+        radio.set_value(next(option for option in radio.options if option != radio.value))
+        rerun(at, action, latencies)
+    elif action == "gallery_page":
+        buttons = {button.key: button for button in at.button if button.key in ("gallery-prev", "gallery-next")}
+        button = buttons.get("gallery-next")
+        if button is not None and button.disabled:
+            button = buttons.get("gallery-prev")
+        if button is not None and not button.disabled:
+            button.click()
+            rerun(at, action, latencies)
+
+
+def session(index, args, gate, results):
+    rng = np.random.default_rng(args.seed + index)
+    names = list(ACTIONS)
+    weights = np.array(list(ACTIONS.values()), dtype=float)
+    latencies = []
+    at = AppTest.from_file(APP_FILE, default_timeout=args.timeout)
+    gate.wait()
+    try:
+        rerun(at, "first render", latencies)
+        for _ in range(args.actions):
+            if args.think:
+                time.sleep(rng.exponential(args.think))
+            interact(at, rng.choice(names, p=weights / weights.sum()), rng, latencies)
+        error = None
+    except Exception as exc:  # noqa: BLE001 - reported per session
+        error = f"{type(exc).__name__}: {exc}"
+    results[index] = {"latencies": latencies, "error": error, "app": at}
+
+
+def sweep(n_sessions, args):
+    instrumentation.recent = collections.deque()
+    results = {}
+    gate = threading.Barrier(n_sessions + 1)
+    threads = [threading.Thread(target=session, args=(i, args, gate, results)) for i in range(n_sessions)]
+    for thread in threads:
+        thread.start()
+    baseline_rss = rss_bytes()
+    sampler = Sampler()
+    sampler.start()
+    start = time.perf_counter()
+    gate.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+    # Measured while every session (and its AppTest) is still alive
+    final_rss = rss_bytes()
+
+    latencies = [item for result in results.values() for item in result["latencies"]]
+    by_action = collections.defaultdict(list)
+    for action, seconds in latencies:
+        by_action[action].append(seconds)
+    interactions = [seconds for action, seconds in latencies if action != "first render"]
+    cpus = available_cpus()
+    usage = [cpu / cpus for cpu, _ in sampler.samples]
+    peak_rss = max([rss for _, rss in sampler.samples] + [final_rss])
+    return {
+        "sessions": n_sessions,
+        "errors": [result["error"] for result in results.values() if result["error"]],
+        "reruns": len(latencies),
+        "elapsed_s": round(elapsed, 2),
+        "reruns_per_s": round(len(latencies) / elapsed, 2),
+        "first_render": {"p50_ms": pct(by_action["first render"], 50), "p99_ms": pct(by_action["first render"], 99)},
+        "interaction": {"p50_ms": pct(interactions, 50), "p99_ms": pct(interactions, 99)},
+        "actions": {
+            action: {"n": len(values), "p50_ms": pct(values, 50), "p99_ms": pct(values, 99)}
+            for action, values in by_action.items() if action != "first render"
+        },
+        "stages": instrumentation.percentiles(instrumentation.recent, pcts=(50, 99)),
+        "memory": {
+            "baseline_mb": round(baseline_rss / 2**20, 1),
+            "peak_mb": round(peak_rss / 2**20, 1),
+            "per_session_mb": round((final_rss - baseline_rss) / 2**20 / n_sessions, 2),
+        },
+        "cpu": {
+            "cores": cpus,
+            "mean_pct": round(100 * float(np.mean(usage)), 1) if usage else None,
+            "p99_pct": round(100 * float(np.percentile(usage, 99)), 1) if usage else None,
+            # Share of samples with every available core busy
+            "saturated_pct": round(100 * float(np.mean(np.array(usage) > 0.9)), 1) if usage else None,
+        },
+    }
+
+
+def print_sweep(report):
+    print(
+        f"\n{report['sessions']} session(s): {report['reruns']} reruns in {report['elapsed_s']} s"
+        f" ({report['reruns_per_s']}/s)"
+    )
+    for error in report["errors"]:
+        print(f"  ERROR {error}")
+    print(f"  {'':<22} {'n':>5} {'p50':>10} {'p99':>10}")
+    rows = [("first render", report["first_render"] | {"n": report["sessions"]}),
+            ("all interactions", report["interaction"] | {"n": report["reruns"] - report["sessions"]})]
+    rows += sorted(report["actions"].items())
+    for name, stats in rows:
+        if stats["p50_ms"] is not None:
+            print(f"  {name:<22} {stats['n']:>5} {stats['p50_ms']:>8.1f}ms {stats['p99_ms']:>8.1f}ms")
+    print("  stages (per rerun):")
+    for name, stats in report["stages"].items():
+        print(f"    {name:<20} {stats['n']:>5} {stats['p50_ms']:>8.1f}ms {stats['p99_ms']:>8.1f}ms")
+    memory, cpu = report["memory"], report["cpu"]
+    print(
+        f"  memory: {memory['per_session_mb']} MB/session (baseline {memory['baseline_mb']} MB,"
+        f" peak {memory['peak_mb']} MB)"
+    )
+    print(
+        f"  cpu ({cpu['cores']} core(s)): mean {cpu['mean_pct']}%, p99 {cpu['p99_pct']}%,"
+        f" saturated {cpu['saturated_pct']}% of the time"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=DEFAULT_SESSIONS)
+    parser.add_argument("--rows", type=int, default=2000, help="rows in the synthetic sheet")
+    parser.add_argument("--actions", type=int, default=15, help="interactions per session")
+    parser.add_argument("--think", type=float, default=0.5, help="mean think time between actions, in seconds")
+    parser.add_argument("--head-latency", type=float, default=0.02, help="stub Cloudinary HEAD latency, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=300, help="per-rerun timeout, in seconds")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    # Deprecation notices would be logged once per rerun. Reading an
+    # option parses the config, which resets the log level: do it first.
+    config.get_option("logger.level")
+    streamlit.logger.set_log_level("error")
+    share_runtime()
+    reports = []
+    with StubServer(head_latency=args.head_latency) as stub:
+        stub.set_csv(synthetic.make_csv(args.rows, image_base=stub.base_url))
+        loader.DATA_URL = stub.data_url
+        assets.CLOUDINARY_BASE_URL = stub.base_url
+
+        warm = AppTest.from_file(APP_FILE, default_timeout=args.timeout)
+        start = time.perf_counter()
+        warm.run()
+        if warm.exception:
+            sys.exit(f"warm-up failed: {warm.exception[0].value}")
+        print(f"warm-up render: {time.perf_counter() - start:.2f} s ({args.rows:,} rows)")
+        del warm
+
+        for n_sessions in args.sessions:
+            stub.reset_counts()
+            report = sweep(n_sessions, args)
+            report["stub_requests"] = dict(stub.counts)
+            print_sweep(report)
+            reports.append(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "cpus": available_cpus(),
+                    "rows": args.rows,
+                    "actions": args.actions,
+                    "think_s": args.think,
+                    "head_latency_s": args.head_latency,
+                    "seed": args.seed,
+                },
+                "sweeps": reports,
+            }, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
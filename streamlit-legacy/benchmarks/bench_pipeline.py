@@ -0,0 +1,220 @@
+"""Per-stage timings of the dashboard pipeline on synthetic portfolios.
+
+    python benchmarks/bench_pipeline.py                          # 100, 10k, 100k rows
+    python benchmarks/bench_pipeline.py --rows 100 10000 100000 1000000
+    python benchmarks/bench_pipeline.py --output base.json
+    python benchmarks/bench_pipeline.py --compare base.json      # exit 1 on regressions
+
+Sheets come from ``synthetic.py`` (fixed seed) and are served, together
+with every Cloudinary HEAD probe, by a local ``stub_server``: no network is
+used and the shared cross-process cache is disabled, so runs on the same
+machine are comparable. Each stage reports the median and minimum of
+``--repeat`` runs; caches a stage depends on are cleared before each run.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, HERE)
+
+# Before the app modules are imported: no shared cache, no stray snapshots
+os.environ["DASHBOARD_SHARED_CACHE"] = ""
+os.environ.setdefault("DASHBOARD_CACHE_DIR", tempfile.mkdtemp(prefix="bench-pipeline-"))
+warnings.filterwarnings("ignore")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import assets  # noqa: E402
+import loader  # noqa: E402
+import map_view  # noqa: E402
+import synthetic  # noqa: E402
+from pipeline import details_table, linked_values, prepare_dataset  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+DEFAULT_ROWS = [100, 10_000, 100_000]
+TABLE_COLUMNS = ["Project_Name", "Year", "Role", "Duration_Display", "Client_Company", "Country"]
+
+
+def timed(fn, repeat, setup=None):
+    times = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return {"median_ms": round(statistics.median(times) * 1000, 3), "min_ms": round(min(times) * 1000, 3)}, result
+
+
+def selections_for(dataset):
+    """Representative filter states: everything, a 3-year window, and a
+    narrow Industry × Role slice."""
+    years = dataset.active_index.years
+    mid = len(years) // 2
+    return [
+        {"Year": years, "Industry": None, "Category": None, "Role": None},
+        {"Year": years[mid - 1:mid + 2], "Industry": None, "Category": None, "Role": None},
+        {
+            "Year": years,
+            "Industry": dataset.facet_index.values("Industry")[:2],
+            "Category": None,
+            "Role": dataset.facet_index.values("Role")[:1],
+        },
+    ]
+
+
+def bench_size(stub, rows, repeat):
+    stub.set_csv(synthetic.make_csv(rows, image_base=stub.base_url))
+    url = stub.data_url
+    assets.CLOUDINARY_BASE_URL = stub.base_url
+    results = {}
+
+    def cold_load():
+        loader._cache.clear()
+        for path in loader._snapshot_paths(url):
+            if os.path.exists(path):
+                os.remove(path)
+
+    results["load (network + parse)"], df = timed(lambda: loader.load_data(url), repeat, setup=cold_load)
+    results["load (snapshot)"], _ = timed(lambda: loader._read_snapshot(url), repeat)
+    results["prepare (expand + indexes)"], dataset = timed(lambda: prepare_dataset(df), repeat)
+
+    projects = dataset.projects
+    all_selections = selections_for(dataset)
+    year = dataset.active_index.years[-1]
+
+    results["filter"], filtered = timed(
+        lambda: [projects[dataset.facet_index.resolve(selections)] for selections in all_selections], repeat
+    )
+    queries = ["bridge", "sur", "client 04 design"]
+    results["text search (3 queries)"], _ = timed(lambda: [dataset.text_index.search(q) for q in queries], repeat)
+    results["facet options"], _ = timed(lambda: [dataset.cube.counts(s) for s in all_selections], repeat)
+    results["metrics"], _ = timed(lambda: [dataset.cube.metrics(s, year) for s in all_selections], repeat)
+
+    everything = filtered[0]
+    results["skills/software aggregation"], software = timed(lambda: (
+        linked_values(dataset.links["Skills"], "Skill", everything.index),
+        linked_values(dataset.links["Software"], "Software", everything.index),
+    )[1], repeat)
+    results["logos (cold HEADs)"], _ = timed(lambda: assets.resolve_logos(software), repeat, setup=assets.url_cache.clear)
+    results["logos (cached)"], _ = timed(lambda: assets.resolve_logos(software), repeat)
+
+    images = everything["image_link"].dropna()
+    images = images[images.str.startswith("http")].head(16).tolist()
+    results["gallery checks (cold HEADs)"], _ = timed(lambda: assets.check_urls(images), repeat, setup=assets.url_cache.clear)
+
+    def build_map():
+        return map_view.render_map_html(
+            everything.index, year, f"bench-{rows}", dataset.keys,
+            lambda: map_view.project_points(
+                dataset.map_features, everything.index, dataset.active_index.is_active(everything.index, year)
+            ),
+        )
+    results["map build"], html = timed(build_map, repeat, setup=map_view.map_cache.clear)
+    results["map (repeat, render cache)"], _ = timed(build_map, repeat)
+
+    def build_viewport_map():
+        # What the app sends past map_view.VIEWPORT_THRESHOLD, before any pan or zoom
+        spatial_index = dataset.spatial_index
+        located = spatial_index.select(everything.index)
+        extent = spatial_index.extent(located)
+        in_view = spatial_index.select(spatial_index.ids[located], map_view.padded(extent))
+        highlighted = dataset.active_index.is_active(spatial_index.ids[in_view], year)
+        layer, _ = map_view.viewport_layer(dataset.map_features, spatial_index, in_view, map_view.fit_zoom(extent), highlighted)
+        map_ = map_view.base_map(extent)
+        layer.add_to(map_)
+        return map_.get_root().render()
+    results["map (viewport)"], viewport_html = timed(build_viewport_map, repeat)
+
+    columns = [col for col in TABLE_COLUMNS if col in everything.columns]
+    results["table build"], _ = timed(
+        lambda: details_table(everything, columns, dataset.active_index, year), repeat
+    )
+    return results, {
+        "projects": len(projects), "map_html_bytes": len(html or ""), "viewport_html_bytes": len(viewport_html),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Prints ratios of the minimum times against ``baseline`` (the least
+    noisy statistic on a shared machine); returns the regressed stages."""
+    regressions = []
+    print(f"\n{'rows':>8}  {'stage':<36} {'base':>10} {'now':>10} {'ratio':>6}")
+    for rows, stages in results.items():
+        for stage, timing in stages.items():
+            base = baseline.get(rows, {}).get(stage)
+            if base is None:
+                continue
+            ratio = timing["min_ms"] / base["min_ms"] if base["min_ms"] else float("inf")
+            # Sub-millisecond stages are dominated by noise
+            flagged = ratio > 1 + tolerance and timing["min_ms"] - base["min_ms"] > 1.0
+            if flagged:
+                regressions.append((rows, stage))
+            print(
+                f"{rows:>8}  {stage:<36} {base['min_ms']:>9.1f}ms {timing['min_ms']:>9.1f}ms"
+                f" {ratio:>5.2f}x{'  REGRESSION' if flagged else ''}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON from a previous --output run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = {}
+    sizes = {}
+    with StubServer() as stub:
+        for rows in args.rows:
+            repeat = args.repeat if rows < 1_000_000 else max(1, args.repeat // 2)
+            stages, info = bench_size(stub, rows, repeat)
+            results[str(rows)] = stages
+            sizes[str(rows)] = info
+            print(
+                f"\n{rows:,} rows ({info['projects']:,} visible projects, map {info['map_html_bytes'] / 1e6:.1f} MB,"
+                f" viewport map {info['viewport_html_bytes'] / 1e6:.2f} MB)"
+            )
+            for stage, timing in stages.items():
+                print(f"  {stage:<36} {timing['median_ms']:>10.1f} ms  (min {timing['min_ms']:.1f})")
+        requests = dict(stub.counts)
+    print(f"\nstub requests: {requests}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)["results"]
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Incremental refresh vs full rebuild after editing a few rows.
+
+    python benchmarks/bench_refresh.py
+    python benchmarks/bench_refresh.py --rows 10000 100000 --edits 1 10 100
+
+data.csv is replicated up to each size; each run modifies, adds and removes
+``edits`` projects in roughly equal parts and checks that the refreshed
+dataset answers filters and places map markers like a full
+``prepare_dataset`` of the new sheet. Edits that leave rows without
+coordinates, and a sheet with none at all, are checked first.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+import loader  # noqa: E402
+from incremental import refresh_dataset  # noqa: E402
+from pipeline import prepare_dataset  # noqa: E402
+
+DATA_CSV = os.path.join(os.path.dirname(APP_DIR), "data.csv")
+
+
+def make_frame(rows):
+    with open(DATA_CSV, encoding="utf-8") as fh:
+        base = loader.parse_csv(fh.read())
+    copies = -(-rows // len(base))
+    df = pd.concat([base] * copies, ignore_index=True).head(rows)
+    df["Project_Name"] = df["Project_Name"].astype(str) + " #" + df.index.astype(str)
+    return df
+
+
+def edit(df, edits, seed=0, unlocated=False):
+    rng = np.random.default_rng(seed)
+    third = max(edits // 3, 1)
+    picked = rng.choice(len(df), size=3 * third, replace=False)
+    modified, removed, source = picked[:third], picked[third:2 * third], picked[2 * third:]
+    out = df.copy()
+    out["Duration_Months"] = out["Duration_Months"].astype(float)
+    out.loc[modified, "Duration_Months"] = out.loc[modified, "Duration_Months"].fillna(0) + 24
+    added = df.iloc[source].copy()
+    added["Project_Name"] = added["Project_Name"].astype(str) + " (new)"
+    if unlocated:
+        # Coordinates not filled in yet: the refreshed rows have none
+        out.loc[modified, ["Latitud", "Longitud"]] = np.nan
+        added[["Latitud", "Longitud"]] = np.nan
+    out = pd.concat([out.drop(index=removed), added], ignore_index=True)
+    return loader._coerce_types(out)
+
+
+def same_answers(a, b):
+    years = b.active_index.years
+    for selections in [{"Year": years}, {"Year": years[len(years) // 2:]}]:
+        ma, mb = a.facet_index.resolve(selections), b.facet_index.resolve(selections)
+        if sorted(a.projects.loc[ma, "Project_Name"]) != sorted(b.projects.loc[mb, "Project_Name"]):
+            return False
+        if a.cube.metrics(selections, years[-1]) != b.cube.metrics(selections, years[-1]):
+            return False
+    return _live_tooltips(a) == _live_tooltips(b)
+
+
+def _live_tooltips(dataset):
+    # A refresh leaves superseded features behind under dead ids
+    features = dataset.map_features
+    return sorted(features.loc[dataset.alive[features.index.to_numpy(dtype=np.int64)], "tooltip"])
+
+
+def unlocated(df):
+    out = df.copy()
+    out[["Latitud", "Longitud"]] = np.nan
+    return out
+
+
+def check_edge_cases(rows=1000, edits=30):
+    """Refreshes where the rebuilt rows (or all rows) have no coordinates."""
+    df = make_frame(rows)
+    cases = {
+        "unlocated edits": (df, edit(df, edits, unlocated=True)),
+        "no coordinates": (unlocated(df), unlocated(edit(df, edits))),
+    }
+    for label, (old, new) in cases.items():
+        refreshed, summary = refresh_dataset(prepare_dataset(old), new)
+        same = same_answers(refreshed, prepare_dataset(new))
+        print(f"{label:>16}: same {same} ({summary['mode']})")
+        if not same:
+            raise SystemExit(f"{label}: refreshed dataset differs from a full rebuild")
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--edits", type=int, nargs="+", default=[3, 30, 300])
+    args = parser.parse_args()
+
+    check_edge_cases()
+    print(f"{'rows':>8} {'edits':>6} {'full':>9} {'refresh':>9} {'speedup':>8}  same")
+    for rows in args.rows:
+        df = make_frame(rows)
+        dataset = prepare_dataset(df)
+        for edits in args.edits:
+            new = edit(df, edits)
+            full_time, full = timed(prepare_dataset, new)
+            refresh_time, (refreshed, summary) = timed(refresh_dataset, dataset, new)
+            print(
+                f"{rows:>8} {edits:>6} {full_time:>8.3f}s {refresh_time:>8.3f}s"
+                f" {full_time / refresh_time:>7.1f}x  {same_answers(refreshed, full)} ({summary['mode']})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Upstream work done by N worker processes with and without the shared cache.
+
+    python benchmarks/bench_shared_cache.py
+    python benchmarks/bench_shared_cache.py --workers 8 --urls 200
+
+A local stub server stands in for GitHub (data.csv) and Cloudinary (HEAD
+probes), so no network is needed. Each worker process loads the sheet,
+prepares the dataset, checks ``--urls`` image URLs and renders the map,
+like a cold Streamlit worker would. Workers are started together, then
+once more after the first wave finished; the table shows how many requests
+reached the stub and how many datasets/maps were built from scratch.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+from stub_server import StubServer
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_CSV = os.path.join(os.path.dirname(APP_DIR), "data.csv")
+
+
+def worker(base_url, n_urls, gate, results):
+    sys.path.insert(0, APP_DIR)
+    warnings.filterwarnings("ignore")
+    import assets
+    import incremental
+    import loader
+    import map_view
+    import shared_cache
+
+    gate.wait()
+    df = loader.load_data(base_url + "data.csv")
+    version = loader.get_load_info(base_url + "data.csv")["version"]
+
+    key = f"{version}-{incremental.CODE_VERSION}"
+    dataset = shared_cache.cache.get("dataset", key)
+    built_dataset = dataset is None
+    if built_dataset:
+        dataset, _ = incremental.refresh_dataset(None, df)
+        shared_cache.cache.set("dataset", key, dataset)
+
+    assets.check_urls([f"{base_url}img/{'ok' if i % 2 else 'missing'}-{i}.jpg" for i in range(n_urls)])
+
+    ids = dataset.projects.index[dataset.alive]
+    built_map = []
+    map_view.render_map_html(
+        ids, 2020, version, dataset.keys,
+        lambda: built_map.append(1) or map_view.project_points(dataset.map_features, ids, dataset.active_index.is_active(ids, 2020)),
+    )
+    results.put((int(built_dataset), len(built_map)))
+
+
+def run_wave(base_url, n_workers, n_urls):
+    ctx = multiprocessing.get_context("spawn")
+    gate = ctx.Event()
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(base_url, n_urls, gate, results)) for _ in range(n_workers)]
+    for proc in procs:
+        proc.start()
+    time.sleep(3.0)  # let every worker finish importing
+    start = time.perf_counter()
+    gate.set()
+    built = [results.get(timeout=120) for _ in procs]
+    for proc in procs:
+        proc.join()
+    return time.perf_counter() - start, sum(b[0] for b in built), sum(b[1] for b in built)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--urls", type=int, default=100)
+    args = parser.parse_args()
+
+    with open(DATA_CSV, "rb") as fh:
+        stub = StubServer(fh.read(), head_latency=0.01).start()
+
+    print(f"{'shared':>6} {'wave':>5} {'wall':>7} {'GET':>5} {'HEAD':>6} {'datasets':>9} {'maps':>5}")
+    for shared in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["DASHBOARD_CACHE_DIR"] = tmp
+            os.environ["DASHBOARD_SHARED_CACHE"] = os.path.join(tmp, "shared.sqlite") if shared else ""
+            for wave in (1, 2):
+                stub.reset_counts()
+                wall, datasets, maps = run_wave(stub.base_url, args.workers, args.urls)
+                print(
+                    f"{'yes' if shared else 'no':>6} {wave:>5} {wall:>6.2f}s {stub.counts['GET']:>5}"
+                    f" {stub.counts['HEAD']:>6} {datasets:>9} {maps:>5}"
+                )
+    stub.stop()
+
+if __name__ == "__main__":
+    main()
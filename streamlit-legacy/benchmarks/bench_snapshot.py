@@ -0,0 +1,82 @@
+"""Cold-start load time: pd.read_csv of data.csv vs the memory-mapped Arrow snapshot.
+
+    python benchmarks/bench_snapshot.py
+    python benchmarks/bench_snapshot.py --rows 10000 100000 1000000
+
+data.csv is replicated up to each size. Every measurement runs in a fresh
+interpreter, so it includes imports and nothing is warm in-process.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+DATA_CSV = os.path.join(os.path.dirname(APP_DIR), "data.csv")
+REPEATS = 3
+
+_CSV_LOAD = """
+import sys, time
+start = time.perf_counter()
+import loader
+with open(sys.argv[1], encoding="utf-8") as fh:
+    df = loader.parse_csv(fh.read())
+print(time.perf_counter() - start)
+"""
+
+_SNAPSHOT_LOAD = """
+import sys, time
+start = time.perf_counter()
+import loader
+df, _ = loader._read_snapshot(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+
+def make_csv(rows, path):
+    base = pd.read_csv(DATA_CSV)
+    copies = -(-rows // len(base))
+    df = pd.concat([base] * copies, ignore_index=True).head(rows)
+    df["Project_Name"] = df["Project_Name"] + " #" + df.index.astype(str)
+    df.to_csv(path, index=False)
+
+
+def timed_subprocess(code, arg, cache_dir):
+    env = dict(os.environ, DASHBOARD_CACHE_DIR=cache_dir, PYTHONPATH=APP_DIR)
+    times = []
+    for _ in range(REPEATS):
+        out = subprocess.run([sys.executable, "-c", code, arg], env=env, capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    sys.path.insert(0, APP_DIR)
+    import loader
+
+    print(f"{'rows':>9} {'read_csv':>10} {'snapshot':>10} {'speedup':>8} {'csv MB':>7} {'arrow MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        loader.CACHE_DIR = tmp
+        for rows in args.rows:
+            csv_path = os.path.join(tmp, f"data-{rows}.csv")
+            make_csv(rows, csv_path)
+            url = f"bench://{rows}"
+            snapshot_path = loader.build_snapshot(csv_path, url)
+            csv_time = timed_subprocess(_CSV_LOAD, csv_path, tmp)
+            snapshot_time = timed_subprocess(_SNAPSHOT_LOAD, url, tmp)
+            print(
+                f"{rows:>9} {csv_time:>9.3f}s {snapshot_time:>9.3f}s {csv_time / snapshot_time:>7.1f}x"
+                f" {os.path.getsize(csv_path) / 1e6:>7.1f} {os.path.getsize(snapshot_path) / 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
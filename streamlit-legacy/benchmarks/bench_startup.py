@@ -0,0 +1,167 @@
+"""Cold start: import time of app.py's modules and when each section paints.
+
+    python benchmarks/bench_startup.py                  # 2,000-row sheet, 3 fresh processes
+    python benchmarks/bench_startup.py --rows 10000 --runs 5 --output startup.json
+
+Two measurements, each in fresh interpreters so nothing is already imported:
+
+- ``python -X importtime`` on app.py's top-level import statements: total
+  and the slowest top-level modules (cumulative, as importtime reports them).
+- A first render of app.py with ``AppTest`` against a synthetic sheet served
+  by ``stub_server`` (no network, no shared cache): the render's wall time,
+  the part of it spent before the profiled rerun starts (the script's own
+  imports), and when each section's stage finished, counted from the start
+  of the render: the order and time at which the browser gets it.
+  Also whether folium had to be imported at all.
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+APP_FILE = os.path.join(APP_DIR, "app.py")
+
+# Sections as a viewer sees them, and the stage that ends with each one painted
+SECTIONS = {
+    "sidebar": "5 sidebar filters",
+    "skills": "7 skills + software",
+    "details + metrics": "9 details",
+    "map": "7 map",
+    "gallery": "8 gallery",
+}
+
+
+def app_imports():
+    """app.py's top-level import statements, as source."""
+    with open(APP_FILE, encoding="utf-8") as fh:
+        source = fh.read()
+    tree = ast.parse(source)
+    return "\n".join(
+        ast.get_source_segment(source, node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+
+def import_times(top):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", app_imports()],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Nested imports are indented under the module that imported them
+        if not name.startswith("  "):
+            modules.append((name.strip(), int(cumulative) / 1000))
+    return {
+        "total_ms": round(sum(ms for _, ms in modules), 1),
+        "top": [{"module": name, "cumulative_ms": round(ms, 1)} for name, ms in sorted(modules, key=lambda m: -m[1])[:top]],
+    }
+
+
+def first_render(rows):
+    """Runs in a fresh process (``--child``): one AppTest render, as JSON on stdout."""
+    sys.path.insert(0, APP_DIR)
+    sys.path.insert(0, HERE)
+    os.environ["DASHBOARD_SHARED_CACHE"] = ""
+    os.environ["DASHBOARD_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-startup-")
+    import warnings
+
+    warnings.filterwarnings("ignore")
+    import streamlit.logger
+    from streamlit import config
+    from streamlit.testing.v1 import AppTest
+
+    import synthetic
+    from stub_server import StubServer
+
+    config.get_option("logger.level")
+    streamlit.logger.set_log_level("error")
+    with StubServer() as stub:
+        stub.set_csv(synthetic.make_csv(rows, image_base=stub.base_url))
+        # Point the app at the stub before app.py imports them
+        import assets
+        import instrumentation
+        import loader
+
+        loader.DATA_URL = stub.data_url
+        assets.CLOUDINARY_BASE_URL = stub.base_url
+        at = AppTest.from_file(APP_FILE, default_timeout=300)
+        start = time.perf_counter()
+        at.run()
+        wall_ms = (time.perf_counter() - start) * 1000
+    if at.exception:
+        raise SystemExit(f"render failed: {at.exception[0].value}")
+    record = next(r for r in reversed(instrumentation.recent) if r["kind"] == "script")
+    stages = {entry["stage"]: entry for entry in record["stages"]}
+    before_rerun_ms = wall_ms - record["total_ms"]
+    return {
+        "render_ms": round(wall_ms, 1),
+        "before_rerun_ms": round(before_rerun_ms, 1),
+        "rerun_ms": record["total_ms"],
+        "painted_at_ms": {
+            section: round(before_rerun_ms + stages[stage]["end_ms"], 1)
+            for section, stage in SECTIONS.items() if stage in stages
+        },
+        "folium_imported": "folium" in sys.modules,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000, help="rows in the synthetic sheet")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per measurement")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(first_render(args.rows)))
+        return
+
+    imports = [import_times(args.top) for _ in range(args.runs)]
+    best = min(imports, key=lambda run: run["total_ms"])
+    print(f"app.py imports: median {statistics.median(r['total_ms'] for r in imports):.0f} ms"
+          f" (min {best['total_ms']:.0f} ms over {args.runs} runs)")
+    for module in best["top"]:
+        print(f"  {module['module']:<36} {module['cumulative_ms']:>8.1f} ms")
+
+    renders = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, __file__, "--child", "--rows", str(args.rows)],
+            capture_output=True, text=True, check=True,
+        )
+        renders.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    def median(key, section=None):
+        values = [r[key][section] if section else r[key] for r in renders if section is None or section in r[key]]
+        return statistics.median(values) if values else None
+
+    print(f"\nfirst render, fresh process ({args.rows:,} rows, median of {args.runs}):")
+    print(f"  {'render (wall)':<28} {median('render_ms'):>8.0f} ms")
+    print(f"  {'before the rerun starts':<28} {median('before_rerun_ms'):>8.0f} ms")
+    print("  painted at, from the start of the render:")
+    order = sorted(SECTIONS, key=lambda section: median("painted_at_ms", section) or float("inf"))
+    for section in order:
+        at_ms = median("painted_at_ms", section)
+        if at_ms is not None:
+            print(f"    {section:<26} {at_ms:>8.0f} ms")
+    print(f"  folium imported: {sorted({r['folium_imported'] for r in renders})}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump({"rows": args.rows, "imports": imports, "renders": renders}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Checks logo resolution against a local stub of Cloudinary; exits 1 on failure.
+
+    python benchmarks/check_assets.py
+
+Asserts that ``assets.resolve_logos`` probes the candidates of every name
+concurrently, picks each name's first available candidate (or None), and
+that a repeat call is answered from the URL cache with no HEAD at all.
+The shared cross-process cache is disabled.
+"""
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+# Before the app modules are imported: no shared cache
+os.environ["DASHBOARD_SHARED_CACHE"] = ""
+os.environ.setdefault("DASHBOARD_CACHE_DIR", tempfile.mkdtemp(prefix="check-assets-"))
+
+import assets  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+HEAD_LATENCY = 0.1
+# name -> candidate paths answered 404; the expected winner is the first other one
+MISSING = {
+    "autocad": ["/logos/autocad.png"],
+    "arcgis": ["/logos/arcgis.png", "/logos/arcgis.jpg"],
+    "revit": ["/logos/revit.png", "/logos/revit.jpg", "/revit.png"],
+    "python": [],
+    "civil_3d": ["/logos/civil_3d.png", "/logos/civil_3d.jpg", "/civil_3d.png", "/civil_3d.jpg"],
+}
+
+
+def main():
+    missing_paths = [path for paths in MISSING.values() for path in paths]
+    with StubServer(head_latency=HEAD_LATENCY, missing_paths=missing_paths) as stub:
+        assets.CLOUDINARY_BASE_URL = stub.base_url
+        assets.url_cache.clear()
+        names = sorted(MISSING)
+
+        start = time.perf_counter()
+        logos = assets.resolve_logos(names)
+        elapsed = time.perf_counter() - start
+        n_candidates = len(names) * len(assets.logo_candidates(names[0]))
+
+        expected = {}
+        for name in names:
+            candidates = assets.logo_candidates(name)
+            available = [url for url in candidates if "/" + url[len(stub.base_url):] not in MISSING[name]]
+            expected[name] = available[0] if available else None
+        assert logos == expected, f"resolved {logos}, expected {expected}"
+        assert stub.counts["HEAD"] == n_candidates, f"{stub.counts['HEAD']} HEADs for {n_candidates} candidates"
+        assert stub.peak_heads > 1, "candidates were probed one at a time"
+        # One at a time would take at least n_candidates * HEAD_LATENCY
+        assert elapsed < n_candidates * HEAD_LATENCY, f"{elapsed:.2f} s: probes did not overlap"
+
+        heads = stub.counts["HEAD"]
+        assert assets.resolve_logos(names) == expected
+        assert stub.counts["HEAD"] == heads, f"repeat call made {stub.counts['HEAD'] - heads} HEADs"
+
+    print(
+        f"ok: {len(names)} names, {n_candidates} candidates in {elapsed:.2f} s"
+        f" (up to {stub.peak_heads} in flight), repeat call made no HEAD"
+    )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssertionError as exc:
+        sys.exit(f"FAILED: {exc}")
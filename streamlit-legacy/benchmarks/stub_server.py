@@ -0,0 +1,104 @@
+"""Local stand-in for GitHub raw and Cloudinary used by the benchmarks.
+
+``GET /data.csv`` serves the given CSV with an ETag (and answers 304 to a
+matching If-None-Match). ``HEAD`` on any other path answers 404 when the
+path contains "missing" or is in ``missing_paths``, and 200 otherwise, after
+``head_latency`` seconds. Requests are counted per method, and the most HEADs
+seen in flight at once is kept in ``peak_heads``.
+"""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubServer:
+    def __init__(self, csv_bytes=b"", head_latency=0.0, missing_paths=()):
+        self.head_latency = head_latency
+        self.missing_paths = set(missing_paths)
+        self.counts = {"GET": 0, "HEAD": 0}
+        self.peak_heads = 0
+        self._heads = 0
+        self._lock = threading.Lock()
+        self.set_csv(csv_bytes)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}/"
+        self.data_url = self.base_url + "data.csv"
+
+    def set_csv(self, csv_bytes):
+        self.csv_bytes = csv_bytes
+        self.etag = '"' + hashlib.sha1(csv_bytes).hexdigest()[:16] + '"'
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts = {"GET": 0, "HEAD": 0}
+            self.peak_heads = 0
+
+    def _count(self, method):
+        with self._lock:
+            self.counts[method] += 1
+
+    def _head_in_flight(self, delta):
+        with self._lock:
+            self._heads += delta
+            self.peak_heads = max(self.peak_heads, self._heads)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub._count("GET")
+                if self.path != "/data.csv":
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if self.headers.get("If-None-Match") == stub.etag:
+                    self.send_response(304)
+                    self.send_header("ETag", stub.etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = stub.csv_bytes
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv; charset=utf-8")
+                self.send_header("ETag", stub.etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_HEAD(self):
+                stub._count("HEAD")
+                stub._head_in_flight(1)
+                try:
+                    if stub.head_latency:
+                        time.sleep(stub.head_latency)
+                finally:
+                    stub._head_in_flight(-1)
+                missing = "missing" in self.path or self.path in stub.missing_paths
+                self.send_response(404 if missing else 200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,118 @@
+"""Synthetic project sheets with data.csv's schema, for benchmarks.
+
+    python benchmarks/synthetic.py 100000 > /tmp/sheet.csv
+
+Output is deterministic for a given (rows, seed). Values mimic the real
+export: years as "M/D/YYYY H:MM PM" or "YYYY", roles, skills and software
+as JSON lists, comma-decimal coordinates now and then, ~20% of projects
+without a duration, ~5% hidden with "show dashboard" = "no", and ~2% of
+names repeated as extra phases.
+"""
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    "Project_Name", "Scope of work", "Functions", "Category", "Role", "Duration_Months", "Year",
+    "Client_Company", "Location", "Longitud", "Latitud", "image_link", "Skills", "Software",
+    "Industry", "Country", "Feature", "show dashboard",
+]
+
+CATEGORIES = ["Academic", "Construction", "Design-Build", "Design/Consulting", "Supervision", "Research"]
+ROLES = ["Civil Engineer", "Project Manager", "Designer / Consulter", "CEO", "Student", "Teacher", "Auxiliar / Intern"]
+INDUSTRIES = ["Architecture", "Geotechnics", "Hydraulic", "Roads", "Structures", "Urban Planning", "GIS", "Software"]
+COUNTRIES = ["Colombia", "Ecuador", "Peru", "Unite States", "Mexico"]
+SKILLS = [f"Skill {i:02d}" for i in range(60)] + ["CAD Drafting", "3D Render", "Slope Stability", "Hydrology", "BIM"]
+SOFTWARE = [f"tool_{i:02d}" for i in range(30)] + ["AutoCAD", "ArcGIS", "Civil 3D", "Revit", "Python"]
+WORDS = "design survey slope bridge road drainage model review study plan structure foundation report".split()
+
+DEFAULT_IMAGE_BASE = "https://res.cloudinary.com/dmf2pbdlq/image/upload/"
+
+
+def _json_lists(rng, vocabulary, rows, max_items):
+    counts = rng.integers(1, max_items + 1, size=rows)
+    picks = rng.integers(0, len(vocabulary), size=counts.sum())
+    vocabulary = np.asarray(vocabulary, dtype=object)
+    out = []
+    start = 0
+    for n in counts:
+        out.append(json.dumps(list(vocabulary[picks[start:start + n]]), separators=(",", ":")))
+        start += n
+    return out
+
+
+def _text(rng, rows, words):
+    picks = np.asarray(WORDS, dtype=object)[rng.integers(0, len(WORDS), size=(rows, words))]
+    return [" ".join(row) for row in picks]
+
+
+def make_sheet(rows, seed=0, image_base=DEFAULT_IMAGE_BASE):
+    """Returns a raw (string-typed, as exported) DataFrame with ``rows`` rows."""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(rows)
+
+    names = pd.Series(ids).map("Project {:07d}".format)
+    # A few projects listed twice, as one row per phase
+    phases = rng.random(rows) < 0.02
+    names[phases] = names[np.maximum(ids[phases] - 1, 0)].to_numpy()
+
+    year = rng.integers(2005, 2026, size=rows)
+    month = rng.integers(1, 13, size=rows)
+    day = rng.integers(1, 29, size=rows)
+    dated = rng.random(rows) < 0.7
+    year_text = np.where(
+        dated,
+        pd.Series(month).astype(str) + "/" + pd.Series(day).astype(str) + "/" + pd.Series(year).astype(str) + " 9:00 PM",
+        pd.Series(year).astype(str),
+    )
+
+    duration = rng.integers(1, 72, size=rows).astype(float)
+    duration[rng.random(rows) < 0.2] = np.nan
+
+    lat = rng.uniform(-4.0, 11.0, size=rows)
+    lon = rng.uniform(-79.0, -67.0, size=rows)
+    lat_text = pd.Series(lat.round(6)).astype(str)
+    comma = rng.random(rows) < 0.05
+    lat_text[comma] = lat_text[comma].str.replace(".", ",", regex=False)
+    missing_coords = rng.random(rows) < 0.05
+    lat_text[missing_coords] = ""
+
+    image_state = np.where(rng.random(rows) < 0.8, "ok", "missing")
+    image_link = image_base + "v1/" + pd.Series(image_state) + "_" + (pd.Series(ids) % 5000).astype(str) + ".jpg"
+    image_link[rng.random(rows) < 0.1] = ""
+
+    roles = np.asarray(ROLES, dtype=object)[rng.integers(0, len(ROLES), size=rows)]
+    hidden = np.where(rng.random(rows) < 0.05, "no", np.where(rng.random(rows) < 0.5, "yes", ""))
+
+    sheet = pd.DataFrame({
+        "Project_Name": names,
+        "Scope of work": _text(rng, rows, 12),
+        "Functions": _text(rng, rows, 6),
+        "Category": np.asarray(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), size=rows)],
+        "Role": ['["' + role + '"]' for role in roles],
+        "Duration_Months": duration,
+        "Year": year_text,
+        "Client_Company": pd.Series(rng.integers(0, 500, size=rows)).map("Client {:03d}".format),
+        "Location": pd.Series(rng.integers(0, 200, size=rows)).map("City {:03d}".format),
+        "Longitud": lon.round(6),
+        "Latitud": lat_text,
+        "image_link": image_link,
+        "Skills": _json_lists(rng, SKILLS, rows, 4),
+        "Software": _json_lists(rng, SOFTWARE, rows, 3),
+        "Industry": np.asarray(INDUSTRIES, dtype=object)[rng.integers(0, len(INDUSTRIES), size=rows)],
+        "Country": np.asarray(COUNTRIES, dtype=object)[rng.integers(0, len(COUNTRIES), size=rows)],
+        "Feature": np.nan,
+        "show dashboard": hidden,
+    })
+    return sheet[COLUMNS]
+
+
+def make_csv(rows, seed=0, image_base=DEFAULT_IMAGE_BASE):
+    """The sheet as CSV bytes, like the GitHub raw export."""
+    return make_sheet(rows, seed, image_base).to_csv(index=False).encode("utf-8")
+
+
+if __name__ == "__main__":
+    sys.stdout.write(make_csv(int(sys.argv[1]) if len(sys.argv) > 1 else 100).decode("utf-8"))
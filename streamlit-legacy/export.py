@@ -0,0 +1,239 @@
+"""Precomputed, static bundles of everything the dashboard derives from data.csv.
+
+Runs the same ingest as the app (``pipeline.prepare_dataset``: visibility
+filter, duration spans, role/skill/software normalization) and writes what
+the views need, so any front end can serve it as static files::
+
+    python export.py data.csv build/
+    python export.py data.csv build/ --format json
+
+Layout of ``build/``:
+
+- ``manifest.json``: source version, counts, years, and a hash per file.
+- ``projects.json`` / ``projects.arrow``: one record per visible project;
+  ``project_id`` is the id every other file refers to.
+- ``spans.arrow``: one ``(project_id, Year)`` row per year a project was active.
+- ``facets.json``: sidebar options with project counts, skill and software
+  sets, and the headline metrics over all years.
+- ``map.json``: a GeoJSON FeatureCollection of the located projects.
+- ``years/<year>.json``: per timeline year, the active projects, facet
+  counts, skills, software and metrics with only that year selected.
+
+Output depends only on the CSV: keys are sorted, floats rounded, and no
+timestamps are written, so a re-run on the same sheet changes no byte and a
+changed sheet gives a readable diff. Files of an earlier run that this one
+did not write (a format left out, a year that no longer exists) are removed,
+so ``out_dir`` always holds exactly what ``manifest.json`` lists.
+"""
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+import loader
+from pipeline import prepare_dataset
+
+# Per-project fields, in output order; missing columns are skipped
+PROJECT_COLUMNS = [
+    "Project_Name", "Year", "End_Year", "Project_Span", "Duration_Display", "Duration_Months",
+    "Role_Clean", "Category", "Industry", "Country", "Client_Company", "Location",
+    "Scope of work", "Functions", "Latitud", "Longitud", "image_link",
+]
+COORDINATE_DIGITS = 6
+FORMATS = ("json", "arrow")
+# Fixed-name outputs of every format (year files aside)
+OUTPUTS = ("projects.json", "facets.json", "map.json", "projects.arrow", "spans.arrow")
+
+
+def _json_value(value):
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        return int(value) if value.is_integer() else round(value, COORDINATE_DIGITS)
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+
+def _selection(years):
+    return {"Year": years, "Industry": None, "Category": None, "Role": None}
+
+
+def _linked(dataset, links_name, value_name, project_ids=None):
+    """``{value: n_projects}`` over the link table, optionally restricted to ``project_ids``."""
+    links = dataset.links.get(links_name)
+    if links is None or links.empty:
+        return {}
+    if project_ids is not None:
+        links = links[links["project_id"].isin(project_ids)]
+    counts = links[value_name].value_counts(sort=False)
+    return {str(value): int(n) for value, n in counts.items() if n}
+
+
+def project_table(dataset):
+    """One row per project: ``project_id``, ``PROJECT_COLUMNS`` and the
+    normalized ``Skills`` / ``Software`` lists."""
+    projects = dataset.projects
+    table = pd.DataFrame({"project_id": np.arange(len(projects), dtype=np.int32)})
+    for col in PROJECT_COLUMNS:
+        if col not in projects.columns:
+            continue
+        values = projects[col]
+        if col == "End_Year":
+            values = values.fillna(projects["Year"])
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        if col in ("Latitud", "Longitud"):
+            values = values.astype(float).round(COORDINATE_DIGITS)
+        table[col] = values.to_numpy()
+    for links_name, value_name in (("Skills", "Skill"), ("Software", "Software")):
+        lists = [[] for _ in range(len(projects))]
+        links = dataset.links.get(links_name)
+        if links is not None:
+            for project_id, value in sorted(zip(links["project_id"].tolist(), links[value_name].astype(str))):
+                lists[project_id].append(value)
+        table[links_name] = lists
+    return table
+
+
+def _metrics(dataset, years, timeline_year):
+    metrics = dataset.cube.metrics(_selection(years), timeline_year)
+    metrics["year_range"] = list(metrics["year_range"]) if metrics["year_range"] else None
+    return metrics
+
+
+def global_bundle(dataset):
+    years = dataset.active_index.years
+    counts = dataset.cube.counts(_selection(None))
+    metrics = _metrics(dataset, None, years[-1]) if years else {}
+    metrics.pop("active_in_year", None)
+    return {
+        "years": years,
+        "facets": {facet: {str(value): n for value, n in values.items()} for facet, values in counts.items()},
+        "skills": _linked(dataset, "Skills", "Skill"),
+        "software": _linked(dataset, "Software", "Software"),
+        "metrics": metrics,
+        "active_by_year": {str(year): int(dataset.active_index.mask(year).sum()) for year in years},
+    }
+
+
+def year_bundle(dataset, year):
+    """What the dashboard shows with only ``year`` selected and the timeline on it."""
+    active = np.flatnonzero(dataset.active_index.mask(year))
+    counts = dataset.cube.counts(_selection([year]))
+    counts.pop("Year", None)
+    return {
+        "year": year,
+        "projects": active.tolist(),
+        "started": np.flatnonzero(dataset.projects["Year"].to_numpy() == year).tolist(),
+        "facets": {facet: {str(value): n for value, n in values.items() if n} for facet, values in counts.items()},
+        "skills": _linked(dataset, "Skills", "Skill", active),
+        "software": _linked(dataset, "Software", "Software", active),
+        "metrics": _metrics(dataset, [year], year),
+    }
+
+
+def map_bundle(dataset):
+    features = dataset.map_features
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": int(project_id),
+                "geometry": {"type": "Point", "coordinates": [_json_value(float(lon)), _json_value(float(lat))]},
+                "properties": {"popup": popup, "tooltip": tooltip},
+            }
+            for project_id, lat, lon, popup, tooltip in zip(
+                features.index, features["lat"], features["lon"], features["popup"], features["tooltip"]
+            )
+        ],
+    }
+
+
+def _write_json(path, obj):
+    # One key per line: diffs between two exports stay local to what changed
+    text = json.dumps(obj, sort_keys=True, ensure_ascii=False, indent=1, allow_nan=False)
+    with open(path, "w", encoding="utf-8", newline="\n") as fh:
+        fh.write(text + "\n")
+
+
+def _write_arrow(path, frame):
+    table = pa.Table.from_pandas(frame, preserve_index=False).replace_schema_metadata(None)
+    feather.write_feather(table, path, compression="uncompressed")
+
+
+def _digest(path):
+    with open(path, "rb") as fh:
+        return hashlib.sha1(fh.read()).hexdigest()[:16]
+
+
+def export(csv_path, out_dir, formats=FORMATS):
+    """Writes the bundles for ``csv_path`` into ``out_dir``; returns the manifest."""
+    with open(csv_path, "rb") as fh:
+        content = fh.read()
+    df = loader.parse_csv(content.decode("utf-8"))
+    dataset = prepare_dataset(df)
+    years_dir = os.path.join(out_dir, "years")
+    os.makedirs(years_dir, exist_ok=True)
+    written = []
+
+    def write(name, obj, writer):
+        writer(os.path.join(out_dir, name), obj)
+        written.append(name)
+
+    projects = project_table(dataset)
+    if "json" in formats:
+        records = [{key: _json_value(value) for key, value in row.items()} for row in projects.to_dict("records")]
+        write("projects.json", records, _write_json)
+        write("facets.json", global_bundle(dataset), _write_json)
+        write("map.json", map_bundle(dataset), _write_json)
+        for year in dataset.active_index.years:
+            write(f"years/{year}.json", year_bundle(dataset, year), _write_json)
+    if "arrow" in formats:
+        write("projects.arrow", projects, _write_arrow)
+        write("spans.arrow", dataset.spans, _write_arrow)
+
+    # Whatever an earlier run left that this one did not write (another format,
+    # a year that is gone) would not match the manifest: remove it
+    stale = [name for name in OUTPUTS if name not in written]
+    stale += [f"years/{name}" for name in sorted(os.listdir(years_dir)) if f"years/{name}" not in written]
+    for name in stale:
+        path = os.path.join(out_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    manifest = {
+        "source": {"file": os.path.basename(csv_path), "version": hashlib.sha1(content).hexdigest()[:12]},
+        "counts": {
+            "projects": len(dataset.projects),
+            "spans": len(dataset.spans),
+            "located": len(dataset.map_features),
+            "hidden": len(df) - len(dataset.projects),
+        },
+        "years": dataset.active_index.years,
+        "files": {name: _digest(os.path.join(out_dir, name)) for name in sorted(written)},
+    }
+    _write_json(os.path.join(out_dir, "manifest.json"), manifest)
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write static JSON/Arrow bundles of the dashboard's derived data.")
+    parser.add_argument("csv_path")
+    parser.add_argument("out_dir")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=list(FORMATS), dest="formats")
+    args = parser.parse_args()
+    manifest = export(args.csv_path, args.out_dir, args.formats)
+    print(f"{len(manifest['files'])} files, {manifest['counts']['projects']} projects, version {manifest['source']['version']}")
@@ -0,0 +1,170 @@
+"""Shared HTTP client for every outbound request the dashboard makes.
+
+One pooled ``requests.Session`` with, per host:
+
+- a concurrency limit,
+- bounded retries with exponential backoff, capped by a retry budget,
+- a circuit breaker that fails fast after repeated failures, so a degraded
+  GitHub or Cloudinary costs one exception instead of a 5-15s timeout per call.
+
+``client.stats()`` reports requests, failures, retries, breaker opens and
+latency per host; callables in ``client.listeners`` are called with
+``(method, url, seconds, ok)`` after every attempt.
+"""
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without touching the network while a host's breaker is open."""
+
+
+class _HostState:
+    def __init__(self, concurrency):
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.half_open_trial = False
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.opens = 0
+        self.short_circuits = 0
+        self.latencies = deque(maxlen=500)
+
+
+class HttpClient:
+    def __init__(self, pool_size=16, per_host_limit=8, retries=2, backoff=0.25,
+                 retry_budget=0.2, failure_threshold=5, reset_timeout=30):
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.backoff = backoff
+        # Retries allowed: a floor of 10 plus this fraction of all requests
+        self.retry_budget = retry_budget
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self.listeners = []
+
+    def _host(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = _HostState(self.per_host_limit)
+            return self._hosts[host]
+
+    def _allow(self, state):
+        with state.lock:
+            if state.opened_at is None:
+                return True
+            if time.time() - state.opened_at >= self.reset_timeout and not state.half_open_trial:
+                state.half_open_trial = True
+                return True
+            state.short_circuits += 1
+            return False
+
+    def _record(self, state, ok, latency):
+        with state.lock:
+            state.requests += 1
+            state.latencies.append(latency)
+            if ok:
+                state.consecutive_failures = 0
+                state.opened_at = None
+                state.half_open_trial = False
+                return
+            state.failures += 1
+            state.consecutive_failures += 1
+            if state.half_open_trial or state.consecutive_failures >= self.failure_threshold:
+                if state.opened_at is None or state.half_open_trial:
+                    state.opens += 1
+                state.opened_at = time.time()
+                state.half_open_trial = False
+
+    def _may_retry(self):
+        with self._lock:
+            total = sum(s.requests for s in self._hosts.values())
+            retried = sum(s.retries for s in self._hosts.values())
+        return retried < 10 + self.retry_budget * total
+
+    def request(self, method, url, timeout=5, retries=None, **kwargs):
+        """Like ``session.request``; 5xx and network errors are retried.
+
+        Raises ``CircuitOpenError`` immediately while the host's breaker is open.
+        """
+        state = self._host(url)
+        retries = self.retries if retries is None else retries
+        attempt = 0
+        while True:
+            if not self._allow(state):
+                raise CircuitOpenError(f"circuit open for {urlsplit(url).netloc}")
+            # Latency is timed from inside the per-host limit: queueing for it is not the host's
+            with state.semaphore:
+                start = time.perf_counter()
+                try:
+                    response = self.session.request(method, url, timeout=timeout, **kwargs)
+                    error = None
+                except requests.RequestException as e:
+                    response, error = None, e
+                except BaseException:
+                    # Still a failed attempt: a half-open trial must not stay pending forever
+                    self._record(state, False, time.perf_counter() - start)
+                    raise
+                latency = time.perf_counter() - start
+            ok = error is None and response.status_code < 500
+            self._record(state, ok, latency)
+            for listener in self.listeners:
+                listener(method, url, latency, ok)
+
+            if ok or attempt >= retries or not self._may_retry():
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            with state.lock:
+                state.retries += 1
+            time.sleep(self.backoff * 2 ** (attempt - 1))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def stats(self):
+        """Per-host counters plus p50/p95 latency in milliseconds."""
+        result = {}
+        with self._lock:
+            hosts = dict(self._hosts)
+        for host, state in hosts.items():
+            with state.lock:
+                latencies = sorted(state.latencies)
+                result[host] = {
+                    "requests": state.requests,
+                    "failures": state.failures,
+                    "retries": state.retries,
+                    "opens": state.opens,
+                    "short_circuits": state.short_circuits,
+                    "state": "open" if state.opened_at is not None else "closed",
+                    "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+                    "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+                }
+        return result
+
+
+client = HttpClient()
@@ -0,0 +1,184 @@
+"""Incremental refresh of a prepared ``Dataset`` when the sheet changes.
+
+Rows are keyed by Project_Name (plus occurrence number, for projects listed
+more than once) and fingerprinted by hashing their raw values. A new
+snapshot is diffed against the previous dataset and only added or modified
+projects are re-normalized and patched into the spans, year and facet
+bitsets, skill/software link tables and map features.
+
+Changed projects are appended under new ids; their previous version and
+removed projects are tombstoned (``alive`` False) and cleared from every
+index, so unchanged rows are never copied. Once tombstones make up half the
+frame the next refresh rebuilds from scratch, which compacts it.
+
+The result is a new ``Dataset``; structures that did not change are shared
+with the previous one, so sessions still reading it never see a half-applied
+patch. Hashing the new snapshot and rebuilding the rollup cube are vectorized
+passes over the whole sheet; everything else scales with the edited rows.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+import pipeline
+import shared_cache
+from pipeline import (
+    Dataset,
+    RollupCube,
+    SpatialIndex,
+    build_link_table,
+    build_map_features,
+    build_span_table,
+    normalize_projects,
+    normalize_skill,
+    normalize_software,
+    prepare_dataset,
+    row_fingerprints,
+    row_keys,
+    visible_mask,
+)
+
+# Past this fraction of changed rows a full rebuild is cheaper than patching
+MAX_CHANGED_FRACTION = 0.5
+# Rebuild (and drop tombstones) once this fraction of the frame is dead
+MAX_DEAD_FRACTION = 0.5
+
+LINK_COLUMNS = {"Skills": ("Skill", normalize_skill), "Software": ("Software", normalize_software)}
+FACET_SOURCES = {"Industry": "Industry", "Category": "Category", "Role": "Role_Clean"}
+CUBE_COLUMNS = ["Year", "End_Year", "Industry", "Category", "Role_Clean", "Project_Name"]
+
+# Shared datasets outlive a deploy: key them on the code that builds them too
+CODE_VERSION = shared_cache.source_digest(sys.modules[__name__], pipeline)
+
+
+class SnapshotDiff:
+    """Changed rows between a dataset and a new sheet."""
+
+    def __init__(self, changed_rows, added, modified_ids, removed_ids):
+        self.changed_rows = changed_rows  # row positions in the new sheet, modified then added
+        self.added = added                # number of those rows that are new projects
+        self.modified_ids = modified_ids  # project ids superseded by a modified row
+        self.removed_ids = removed_ids    # project ids no longer in the sheet
+
+    @property
+    def n_changed(self):
+        return len(self.changed_rows) + len(self.removed_ids)
+
+    def summary(self):
+        return {
+            "added": self.added,
+            "modified": len(self.modified_ids),
+            "removed": len(self.removed_ids),
+        }
+
+
+def diff_snapshot(dataset, df):
+    """Compares the visible rows of ``df`` with the rows ``dataset`` was built
+    from. Returns the diff plus the new rows' keys and fingerprints."""
+    positions = np.flatnonzero(visible_mask(df))
+    keys = row_keys(df["Project_Name"].iloc[positions])
+    fingerprints = row_fingerprints(df)[positions]
+
+    ids = dataset.keys.reindex(keys).to_numpy()
+    matched = ~pd.isna(ids)
+    matched_ids = ids[matched].astype(np.int64)
+    modified = dataset.fingerprints[matched_ids] != fingerprints[matched]
+    # Positions within the visible rows: modified first, then added
+    order = np.concatenate([np.flatnonzero(matched)[modified], np.flatnonzero(~matched)])
+
+    diff = SnapshotDiff(
+        changed_rows=positions[order],
+        added=int((~matched).sum()),
+        modified_ids=matched_ids[modified],
+        removed_ids=np.setdiff1d(dataset.keys.to_numpy(), matched_ids).astype(np.int64),
+    )
+    return diff, keys[order], fingerprints[order]
+
+
+def _concat_categoricals(frames):
+    """``pd.concat`` that keeps categorical columns categorical when the
+    frames' categories differ."""
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            union = pd.api.types.union_categoricals(
+                [frame[col].astype("category") for frame in frames if col in frame], sort_categories=True
+            ).categories
+            frames = [
+                frame.assign(**{col: frame[col].astype("category").cat.set_categories(union)}) if col in frame else frame
+                for frame in frames
+            ]
+    return pd.concat(frames)
+
+
+def _patch_links(links, column, name, normalize, cleared_ids, rows):
+    kept = links[~np.isin(links["project_id"].to_numpy(), cleared_ids)]
+    fresh = build_link_table(rows[column], normalize, name)
+    fresh["project_id"] = rows.index.to_numpy(dtype=np.int32)[fresh["project_id"].to_numpy()]
+    return _concat_categoricals([kept, fresh]).reset_index(drop=True)
+
+
+def refresh_dataset(dataset, df):
+    """Returns ``(dataset, summary)`` for the new sheet ``df``.
+
+    ``summary`` counts added/modified/removed projects and says whether the
+    patch path or a full ``prepare_dataset`` was used.
+    """
+    if dataset is None or list(df.columns) != dataset.raw_columns:
+        return prepare_dataset(df), {"mode": "full"}
+
+    diff, keys, fingerprints = diff_snapshot(dataset, df)
+    summary = dict(diff.summary(), mode="incremental")
+    if diff.n_changed == 0:
+        return dataset, summary
+
+    old = dataset.projects
+    n_old = len(old)
+    n_projects = n_old + len(diff.changed_rows)
+    n_live = len(dataset.keys) - len(diff.removed_ids) + diff.added
+    if (diff.n_changed > MAX_CHANGED_FRACTION * max(n_live, 1)
+            or n_projects - n_live > MAX_DEAD_FRACTION * n_projects):
+        return prepare_dataset(df), dict(summary, mode="full")
+
+    new_ids = np.arange(n_old, n_projects, dtype=np.int64)
+    cleared_ids = np.concatenate([diff.modified_ids, diff.removed_ids])
+    rows = normalize_projects(df.iloc[diff.changed_rows].set_axis(pd.Index(new_ids)))
+
+    projects = _concat_categoricals([old, rows])
+    alive = np.concatenate([dataset.alive, np.ones(len(new_ids), dtype=bool)])
+    alive[cleared_ids] = False
+
+    old_spans = dataset.spans
+    cleared_mask = np.isin(old_spans["project_id"].to_numpy(), cleared_ids)
+    fresh_spans = build_span_table(rows)
+    fresh_spans["project_id"] += n_old
+    spans = pd.concat([old_spans[~cleared_mask], fresh_spans], ignore_index=True)
+    active_index = dataset.active_index.patched(old_spans[cleared_mask], fresh_spans, n_projects)
+
+    removed_values = {
+        facet: old[source].iloc[cleared_ids] for facet, source in FACET_SOURCES.items() if source in old.columns
+    }
+    added_values = {facet: rows[source] for facet, source in FACET_SOURCES.items() if source in rows.columns}
+    facet_index = dataset.facet_index.patched(n_projects, alive, removed_values, added_values)
+    facet_index.add_bitsets("Year", active_index.bitsets)
+
+    links = dict(dataset.links)
+    for column, (name, normalize) in LINK_COLUMNS.items():
+        if column in links:
+            links[column] = _patch_links(links[column], column, name, normalize, cleared_ids, rows)
+
+    # Superseded features stay behind but are never selected: their ids are dead
+    map_features = pd.concat([dataset.map_features, build_map_features(rows)])
+
+    live_keys = dataset.keys[~dataset.keys.isin(cleared_ids)]
+    live_keys = pd.concat([live_keys, pd.Series(new_ids, index=keys)])
+    new_fingerprints = np.concatenate([dataset.fingerprints, fingerprints])
+
+    cube_columns = [col for col in CUBE_COLUMNS if col in projects.columns]
+    refreshed = Dataset(
+        projects, spans, active_index, facet_index, links, RollupCube(projects[cube_columns][alive]),
+        map_features, SpatialIndex(map_features, n_projects), dataset.text_index.extended(rows, new_ids, alive),
+        live_keys, new_fingerprints, alive, dataset.raw_columns,
+    )
+    return refreshed, summary
@@ -0,0 +1,194 @@
+"""Per-rerun stage timings for the dashboard.
+
+A rerun (the whole script, or just the timeline fragment) is profiled
+between ``start_rerun`` and ``finish_rerun``, or by decorating a fragment
+with ``profiled``. Inside it, ``stage(name)`` records wall time and call
+count; HTTP requests made through ``http_client`` and cache lookups
+reported with ``cache_event`` are attributed to the innermost open stage,
+including from worker threads started with ``propagate``. Outside a
+profiled rerun every hook is a no-op.
+
+Finished reruns are kept in ``recent`` and, when ``DASHBOARD_PROFILE_LOG``
+is set, appended to that file as JSON lines.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from http_client import client
+
+PROFILE_LOG = os.environ.get("DASHBOARD_PROFILE_LOG")
+
+recent = deque(maxlen=500)
+
+_profile = contextvars.ContextVar("profile", default=None)
+_stage = contextvars.ContextVar("stage", default=None)
+_log_lock = threading.Lock()
+
+
+class RerunProfile:
+    def __init__(self, kind, session=None):
+        self.kind = kind
+        self.session = session
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.total_ms = None
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.total_ms is not None
+
+    def _entry(self, name):
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {"calls": 0, "wall_ms": 0.0, "end_ms": None, "cache": {}, "http": {}}
+        return entry
+
+    def open(self, name):
+        with self._lock:
+            self._entry(name)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            entry = self._entry(name)
+            entry["calls"] += 1
+            entry["wall_ms"] += seconds * 1000
+            # When the stage last finished, relative to the rerun's start: the paint order
+            entry["end_ms"] = (time.perf_counter() - self._start) * 1000
+
+    def add_cache(self, name, cache, outcome):
+        with self._lock:
+            counts = self._entry(name)["cache"].setdefault(cache, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+    def add_http(self, name, host, seconds, ok):
+        with self._lock:
+            http = self._entry(name)["http"].setdefault(host, {"requests": 0, "failures": 0, "latencies_ms": []})
+            http["requests"] += 1
+            http["failures"] += 0 if ok else 1
+            http["latencies_ms"].append(round(seconds * 1000, 1))
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "ts": round(self.started_at, 3),
+                "kind": self.kind,
+                "session": self.session,
+                "total_ms": round(self.total_ms, 2) if self.total_ms is not None else None,
+                "stages": [
+                    {
+                        "stage": name, **entry, "wall_ms": round(entry["wall_ms"], 2),
+                        "end_ms": round(entry["end_ms"], 2) if entry["end_ms"] is not None else None,
+                    }
+                    for name, entry in self.stages.items()
+                ],
+            }
+
+
+def start_rerun(kind, session=None):
+    """Starts profiling a rerun in the current context and returns its profile."""
+    profile = RerunProfile(kind, session)
+    _profile.set(profile)
+    _stage.set(None)
+    return profile
+
+
+def finish_rerun():
+    """Closes the current rerun's profile, records it and returns it as a dict."""
+    profile = _profile.get()
+    if profile is None or profile.finished:
+        return None
+    profile.finish()
+    record = profile.to_dict()
+    recent.append(record)
+    if PROFILE_LOG:
+        with _log_lock, open(PROFILE_LOG, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record) + "\n")
+    return record
+
+
+@contextmanager
+def stage(name):
+    profile = _profile.get()
+    if profile is None or profile.finished:
+        yield
+        return
+    profile.open(name)
+    token = _stage.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_time(name, time.perf_counter() - start)
+        _stage.reset(token)
+
+
+def profiled(kind, session=None):
+    """Decorator for a fragment: profiles it as its own rerun when it runs
+    alone, or as a stage of the enclosing rerun otherwise."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            active = _profile.get()
+            if active is not None and not active.finished:
+                with stage(kind):
+                    return fn(*args, **kwargs)
+            start_rerun(kind, session() if callable(session) else session)
+            try:
+                with stage(kind):
+                    return fn(*args, **kwargs)
+            finally:
+                finish_rerun()
+        return wrapper
+    return decorator
+
+
+def cache_event(cache, outcome):
+    """Counts a lookup in ``cache`` (e.g. ``"hit"``, ``"miss"``, ``"shared"``)."""
+    profile = _profile.get()
+    if profile is not None and not profile.finished:
+        profile.add_cache(_stage.get() or "-", cache, outcome)
+
+
+def propagate(fn):
+    """Wraps ``fn`` so that, run in another thread, it reports to the
+    caller's stage."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def _on_http(method, url, seconds, ok):
+    profile = _profile.get()
+    if profile is not None and not profile.finished:
+        profile.add_http(_stage.get() or "-", urlsplit(url).netloc, seconds, ok)
+
+
+client.listeners.append(_on_http)
+
+
+def percentiles(records, pcts=(50, 95)):
+    """``{stage: {"n", "p50_ms", "p95_ms"}}`` of per-rerun wall time over ``records``."""
+    samples = {}
+    for record in records:
+        for entry in record["stages"]:
+            samples.setdefault(entry["stage"], []).append(entry["wall_ms"])
+        if record["total_ms"] is not None:
+            samples.setdefault(f"total ({record['kind']})", []).append(record["total_ms"])
+    result = {}
+    for name, values in samples.items():
+        values = sorted(values)
+        result[name] = {"n": len(values)}
+        for pct in pcts:
+            result[name][f"p{pct}_ms"] = round(values[min(len(values) - 1, int(len(values) * pct / 100))], 2)
+    return result
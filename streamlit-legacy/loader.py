@@ -0,0 +1,344 @@
+"""Loads data.csv for the Streamlit dashboard.
+
+The parsed frame is kept in an in-process cache for ``CACHE_TTL_SECONDS``.
+Once that expires it is still served, and the remote file is revalidated
+with a conditional GET (ETag / If-Modified-Since) in a background thread
+(stale-while-revalidate): reruns wait on GitHub only when there is nothing
+at all to serve. Every successful parse is also written to a typed on-disk
+snapshot, which is what a fresh process serves while it revalidates.
+
+Snapshots are uncompressed Arrow IPC (Feather v2) files, read through a
+memory map: processes on the same host share the OS page cache instead of
+each re-parsing the CSV. Without pyarrow a pickle snapshot is used instead.
+
+Workers on the same host also share revalidations through ``shared_cache``:
+one process holds a lease while it fetches, and the others pick up its
+result (and its snapshot) instead of each hitting GitHub.
+
+To build a snapshot ahead of time (e.g. in a deploy step)::
+
+    python loader.py data.csv
+"""
+import io
+import json
+import os
+import threading
+import time
+import hashlib
+
+import pandas as pd
+
+import shared_cache
+from http_client import client
+
+try:
+    from pyarrow import feather
+except ImportError:  # pragma: no cover - optional dependency
+    feather = None
+
+DATA_URL = "https://raw.githubusercontent.com/juancanolop/Dashboard_Juan_Cano/refs/heads/main/data.csv"
+
+CACHE_TTL_SECONDS = 300
+FETCH_TIMEOUT_SECONDS = 3
+# One retry on a 5xx or network error, within the client's retry budget
+FETCH_RETRIES = 1
+# Worst case for one revalidation: every attempt times out, plus the backoff
+FETCH_MAX_SECONDS = FETCH_TIMEOUT_SECONDS * (FETCH_RETRIES + 1) + 1
+CACHE_DIR = os.environ.get(
+    "DASHBOARD_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+)
+
+_lock = threading.Lock()
+# url -> {"df", "checked_at", "etag", "last_modified", "version", "source", "error"}.
+# Entries are replaced, never changed in place, so a reader's df and version agree.
+_cache = {}
+# One revalidation at a time per process; held while fetching, never with _lock
+_fetch_lock = threading.Lock()
+_revalidating = set()
+
+
+CATEGORICAL_COLUMNS = ["Industry", "Country", "Category"]
+
+
+def _snapshot_paths(url):
+    key = hashlib.sha1(url.encode()).hexdigest()[:16]
+    return (
+        os.path.join(CACHE_DIR, f"data-{key}.arrow" if feather else f"data-{key}.pkl"),
+        os.path.join(CACHE_DIR, f"data-{key}.json"),
+    )
+
+
+def _parse_year(value):
+    """Extracts a 4-digit year from values like "2/2/2014 9:00 PM" or "2014"."""
+    if pd.isna(value):
+        return None
+    text = str(value).strip()
+    if text.isdigit() and len(text) == 4:
+        return int(text)
+    parts = text.split("/")
+    if len(parts) == 3:
+        year_part = parts[2].strip().split(" ")[0]
+        if year_part.isdigit():
+            return int(year_part)
+    for i in range(len(text) - 3):
+        if text[i:i + 4].isdigit():
+            return int(text[i:i + 4])
+    return None
+
+
+def _coerce_types(df):
+    """Gives the raw sheet export the dtypes the rest of the app expects."""
+    df.columns = df.columns.str.strip()
+    if "Year" in df.columns:
+        numeric_year = pd.to_numeric(df["Year"], errors="coerce")
+        unparsed = numeric_year.isna() & df["Year"].notna()
+        if unparsed.any():
+            numeric_year[unparsed] = df.loc[unparsed, "Year"].map(_parse_year)
+        df["Year"] = pd.to_numeric(numeric_year, errors="coerce")
+        df = df.dropna(subset=["Year"])
+        df["Year"] = df["Year"].astype(int)
+    for col in ["Latitud", "Longitud"]:
+        if col in df.columns:
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                # The sheet's locale sometimes renders decimals with a comma
+                df[col] = pd.to_numeric(df[col].astype(str).str.replace(",", ".", regex=False), errors="coerce")
+            df[col] = df[col].astype("float32")
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    if "Duration_Months" in df.columns:
+        df["Duration_Months"] = pd.to_numeric(df["Duration_Months"], errors="coerce")
+    return df.reset_index(drop=True)
+
+
+def _read_snapshot(url):
+    data_path, meta_path = _snapshot_paths(url)
+    try:
+        with open(meta_path, encoding="utf-8") as fh:
+            meta = json.load(fh)
+        if feather:
+            df = feather.read_table(data_path, memory_map=True).to_pandas()
+        else:
+            df = pd.read_pickle(data_path)
+    except (OSError, ValueError, EOFError):
+        return None
+    return df, meta
+
+
+def _write_snapshot(url, df, meta):
+    data_path, meta_path = _snapshot_paths(url)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        if feather:
+            feather.write_feather(df, data_path + ".tmp", compression="uncompressed")
+        else:
+            df.to_pickle(data_path + ".tmp")
+        os.replace(data_path + ".tmp", data_path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(meta_path + ".tmp", meta_path)
+    except (OSError, ValueError, TypeError):
+        # No snapshot only costs us the offline fallback
+        pass
+
+
+def _content_version(content):
+    return hashlib.sha1(content).hexdigest()[:12]
+
+
+def parse_csv(text):
+    """Parses a sheet export into the typed frame used everywhere else."""
+    return _coerce_types(pd.read_csv(io.StringIO(text)))
+
+
+def build_snapshot(csv_path, url=DATA_URL):
+    """Writes the snapshot for ``url`` from a local CSV export."""
+    with open(csv_path, "rb") as fh:
+        content = fh.read()
+    df = parse_csv(content.decode("utf-8"))
+    _write_snapshot(url, df, {"etag": None, "last_modified": None, "version": _content_version(content)})
+    return _snapshot_paths(url)[0]
+
+
+def _fetch(url, entry):
+    """Revalidates ``entry`` against the remote file, updating it in place."""
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = client.get(url, timeout=FETCH_TIMEOUT_SECONDS, retries=FETCH_RETRIES, headers=headers)
+    if response.status_code == 304 and entry.get("df") is not None:
+        entry["source"] = "revalidated"
+        return
+    if response.status_code != 200:
+        raise RuntimeError(f"GitHub returned HTTP {response.status_code}")
+
+    try:
+        df = parse_csv(response.text)
+    except Exception as e:
+        raise RuntimeError(f"Could not parse CSV ({e}): {response.text[:500]}") from e
+
+    entry.update(
+        df=df,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        version=_content_version(response.content),
+        source="network",
+    )
+    _write_snapshot(url, df, {k: entry[k] for k in ("etag", "last_modified", "version")})
+
+
+def _adopt_shared_check(url, entry, now):
+    """A copy of ``entry`` updated from a recent revalidation by another
+    worker, or None if there is none (or its snapshot is not on disk yet)."""
+    shared = shared_cache.cache.get("fetch", url)
+    if shared is None or shared["version"] is None or now - shared["checked_at"] >= CACHE_TTL_SECONDS:
+        return None
+    entry = dict(entry)
+    if entry.get("version") != shared["version"]:
+        snapshot = _read_snapshot(url)
+        if snapshot is None or snapshot[1].get("version") != shared["version"]:
+            return None
+        df, meta = snapshot
+        entry.update(df=df, **meta)
+    entry.update(checked_at=shared["checked_at"], error=shared["error"], source="shared")
+    return entry
+
+
+def _publish_check(url, entry):
+    shared_cache.cache.set(
+        "fetch", url,
+        {"version": entry.get("version"), "checked_at": entry["checked_at"], "error": entry.get("error")},
+        ttl=CACHE_TTL_SECONDS,
+    )
+
+
+def _store(url, entry):
+    with _lock:
+        _cache[url] = entry
+    return entry
+
+
+def _revalidate(url):
+    """Brings the entry for ``url`` up to date and returns it: from another
+    worker's check, or with a conditional GET under the host-wide lease."""
+    with _fetch_lock:
+        entry = _cache.get(url, {})
+        now = time.time()
+        if entry.get("df") is not None and now - entry.get("checked_at", 0) < CACHE_TTL_SECONDS:
+            return entry  # refreshed while this thread waited for the lock
+        adopted = _adopt_shared_check(url, entry, now)
+        if adopted is not None:
+            return _store(url, adopted)
+
+        # Another worker is already fetching: keep serving what we have and
+        # check again next rerun, or, with nothing to serve yet, wait for it
+        lease = f"fetch:{url}"
+        token = shared_cache.cache.acquire(lease, ttl=FETCH_MAX_SECONDS)
+        if token is None:
+            if entry.get("df") is not None:
+                return entry
+            deadline = time.time() + FETCH_MAX_SECONDS
+            while time.time() < deadline:
+                time.sleep(0.05)
+                adopted = _adopt_shared_check(url, entry, time.time())
+                if adopted is not None:
+                    return _store(url, adopted)
+
+        result = dict(entry)
+        try:
+            _fetch(url, result)
+            result["error"] = None
+        except Exception as e:
+            result["error"] = str(e)
+            if result.get("df") is not None:
+                result["source"] = "snapshot"
+        result["checked_at"] = now
+        _publish_check(url, result)
+        # Timed out waiting for the other worker: its lease is not ours to drop
+        if token is not None:
+            shared_cache.cache.release(lease, token)
+        return _store(url, result)
+
+
+def _revalidate_in_background(url):
+    def run():
+        try:
+            _revalidate(url)
+        finally:
+            with _lock:
+                _revalidating.discard(url)
+
+    threading.Thread(target=run, name=f"revalidate {url}", daemon=True).start()
+
+
+def _info(entry, source=None):
+    return {
+        "source": source or entry.get("source"),
+        "version": entry.get("version"),
+        "etag": entry.get("etag"),
+        "age_seconds": time.time() - entry["checked_at"] if "checked_at" in entry else None,
+        "error": entry.get("error"),
+    }
+
+
+def load_data_with_info(url=DATA_URL):
+    """``load_data`` plus ``get_load_info`` for that same frame, which a
+    background revalidation could otherwise replace in between."""
+    with _lock:
+        entry = _cache.get(url, {})
+        now = time.time()
+        if entry.get("df") is not None and now - entry.get("checked_at", 0) < CACHE_TTL_SECONDS:
+            return entry["df"], _info(entry, "memory")
+
+    adopted = _adopt_shared_check(url, entry, now)
+    if adopted is not None:
+        entry = _store(url, adopted)
+        return entry["df"], _info(entry)
+
+    if entry.get("df") is None:
+        snapshot = _read_snapshot(url)
+        if snapshot is not None:
+            df, meta = snapshot
+            entry = _store(url, dict(entry, df=df, source="snapshot", **meta))
+
+    if entry.get("df") is not None:
+        # Stale but servable: answer now, revalidate off the rerun
+        with _lock:
+            start = url not in _revalidating
+            _revalidating.add(url)
+        if start:
+            _revalidate_in_background(url)
+        return entry["df"], _info(entry, "stale")
+
+    # Nothing to serve yet (first run on this host): wait for the fetch
+    entry = _revalidate(url)
+    df = entry["df"] if entry.get("df") is not None else pd.DataFrame()
+    return df, _info(entry)
+
+
+def load_data(url=DATA_URL):
+    """Returns the parsed project sheet, or an empty frame if nothing is available.
+
+    Callers must treat the returned frame as read-only: it is shared between
+    reruns and sessions.
+    """
+    return load_data_with_info(url)[0]
+
+
+def get_load_info(url=DATA_URL):
+    """Metadata about the cached sheet: source, version, age and error."""
+    return _info(_cache.get(url, {}))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the typed snapshot from a local CSV export.")
+    parser.add_argument("csv_path")
+    parser.add_argument("--url", default=DATA_URL, help="remote URL the snapshot stands in for")
+    args = parser.parse_args()
+    print(build_snapshot(args.csv_path, args.url))
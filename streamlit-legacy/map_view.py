@@ -0,0 +1,281 @@
+"""Project Locations map.
+
+One feature per project, shipped to the browser as a single data array
+rendered by a FastMarkerCluster, so the HTML payload grows with the number
+of sites rather than with one Marker/Popup/Icon object per project-year.
+
+Past ``VIEWPORT_THRESHOLD`` located projects that payload is itself the
+problem, so the app switches to a viewport map: a fixed base map plus one
+layer holding only what is inside the current bounds (with a margin), as
+individual markers or, when there are too many, per-cell counts from the
+dataset's ``SpatialIndex``.
+
+folium is imported by the functions that build maps, not at module import:
+a rerun served from the render cache never loads it.
+"""
+import math
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from importlib import metadata
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+import pipeline
+import shared_cache
+
+TIMELINE_COLOR = "red"
+OTHER_COLOR = "darkblue"
+
+# Above this many located projects only the viewport is sent to the browser
+VIEWPORT_THRESHOLD = 2000
+# Markers per viewport layer; past it the layer shows per-cell counts
+MAX_VIEWPORT_MARKERS = 1000
+# Extra share of the viewport loaded on each side, so short pans stay covered
+VIEWPORT_MARGIN = 0.25
+# Grid level for a zoom level: cells of about 64 px
+CELL_ZOOM_OFFSET = 2
+MAP_SIZE_PX = (700, 600)
+
+# Builds each marker client-side from a [lat, lon, popup, color, tooltip] row
+_MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: 'map-marker', markerColor: row[3], prefix: 'glyphicon'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[2], {maxWidth: 200});
+    marker.bindTooltip(row[4]);
+    return marker;
+}
+"""
+
+
+def project_points(map_features, project_ids, is_timeline):
+    """Map rows (lat, lon, popup, color, tooltip) for ``project_ids``.
+
+    ``map_features`` comes from ``pipeline.build_map_features``;
+    ``is_timeline`` is a boolean array aligned with ``project_ids``.
+    """
+    color = pd.Series(np.where(is_timeline, TIMELINE_COLOR, OTHER_COLOR), index=project_ids)
+    points = map_features[map_features.index.isin(project_ids)]
+    return points.assign(color=color.reindex(points.index).to_numpy())
+
+
+def _empty_map(location, zoom_start):
+    import folium
+
+    return folium.Map(location=location, zoom_start=zoom_start, tiles="CartoDB positron", control_scale=True)
+
+
+def build_map(points):
+    """Folium map centered on ``points`` and fitted to their bounding box."""
+    from folium.plugins import FastMarkerCluster
+
+    lat_center = points["lat"].mean()
+    lon_center = points["lon"].mean()
+    zoom_start = 12 if len(points) == 1 else 5
+    map_ = _empty_map([lat_center, lon_center], zoom_start)
+    FastMarkerCluster(
+        points[["lat", "lon", "popup", "color", "tooltip"]].values.tolist(),
+        callback=_MARKER_CALLBACK,
+        options={"disableClusteringAtZoom": 9, "spiderfyOnMaxZoom": True},
+    ).add_to(map_)
+    if len(points) > 1:
+        map_.fit_bounds(
+            [[points["lat"].min(), points["lon"].min()], [points["lat"].max(), points["lon"].max()]],
+            padding=(0.1, 0.1),
+        )
+    return map_
+
+
+def fit_zoom(bounds):
+    """Web-map zoom level at which ``bounds`` fill a ``MAP_SIZE_PX`` map."""
+    (south, west), (north, east) = bounds
+    width, height = MAP_SIZE_PX
+    zoom_x = math.log2(width * 360 / (256 * max(east - west, 1e-6)))
+    zoom_y = math.log2(height * 180 / (256 * max(north - south, 1e-6)))
+    return int(min(max(min(zoom_x, zoom_y), 1), 18))
+
+
+def viewport_from_state(state):
+    """``(bounds, zoom)`` from the value ``st_folium`` returned, or None
+    before the browser has reported a viewport."""
+    bounds = (state or {}).get("bounds") or {}
+    try:
+        south_west, north_east = bounds["_southWest"], bounds["_northEast"]
+        south, west, north, east = (float(v) for v in (
+            south_west["lat"], south_west["lng"], north_east["lat"], north_east["lng"]))
+    except (KeyError, TypeError):
+        return None
+    zoom = state.get("zoom")
+    return ((south, west), (north, east)), int(zoom) if zoom is not None else fit_zoom(((south, west), (north, east)))
+
+
+def padded(bounds, margin=VIEWPORT_MARGIN):
+    """``bounds`` grown by ``margin`` of their size on each side, with
+    longitudes wrapped into [-180, 180) (west > east across the antimeridian)."""
+    (south, west), (north, east) = bounds
+    pad_lat, pad_lon = (north - south) * margin, (east - west) * margin
+    south, north = max(south - pad_lat, -90.0), min(north + pad_lat, 90.0)
+    west, east = west - pad_lon, east + pad_lon
+    if east - west >= 360:
+        return (south, -180.0), (north, 180.0)
+    return (south, (west + 180) % 360 - 180), (north, (east + 180) % 360 - 180)
+
+
+def base_map(bounds):
+    """Marker-free map fitted to ``bounds``; identical for identical bounds,
+    so ``st_folium`` keeps it mounted and only swaps the viewport layer."""
+    (south, west), (north, east) = bounds
+    map_ = _empty_map([(south + north) / 2, (west + east) / 2], fit_zoom(bounds))
+    if (south, west) != (north, east):
+        map_.fit_bounds([[south, west], [north, east]], padding=(0.1, 0.1))
+    return map_
+
+
+def _cell_marker(cell):
+    import folium
+
+    count = int(cell["count"])
+    color = TIMELINE_COLOR if cell["highlighted"] else OTHER_COLOR
+    size = 26 + 6 * len(f"{count:,}")
+    label = (
+        f'<div style="width:{size}px;height:26px;line-height:22px;border-radius:13px;text-align:center;'
+        f'background:white;border:2px solid {color};color:{color};font:bold 12px sans-serif;">{count:,}</div>'
+    )
+    return folium.Marker(
+        [cell["lat"], cell["lon"]],
+        icon=folium.DivIcon(html=label, icon_size=(size, 26), icon_anchor=(size // 2, 13)),
+        tooltip=f"{count:,} projects ({int(cell['highlighted']):,} in the timeline year)",
+    )
+
+
+def viewport_layer(map_features, spatial_index, positions, zoom, highlighted):
+    """Feature group for the projects at ``positions`` (rows of
+    ``map_features``, already narrowed to the viewport).
+
+    Up to ``MAX_VIEWPORT_MARKERS`` they are markers as in ``build_map``;
+    beyond that, one count bubble per grid cell at ``zoom``. Returns the
+    layer and ``(mode, n_features)``.
+    """
+    import folium
+    from folium.plugins import FastMarkerCluster
+
+    layer = folium.FeatureGroup(name="projects")
+    if len(positions) <= MAX_VIEWPORT_MARKERS:
+        points = map_features.iloc[positions]
+        rows = points.assign(color=np.where(highlighted, TIMELINE_COLOR, OTHER_COLOR))
+        FastMarkerCluster(
+            rows[["lat", "lon", "popup", "color", "tooltip"]].values.tolist(),
+            callback=_MARKER_CALLBACK,
+            options={"disableClusteringAtZoom": 9, "spiderfyOnMaxZoom": True},
+        ).add_to(layer)
+        return layer, ("markers", len(positions))
+    cells = spatial_index.cells(positions, zoom + CELL_ZOOM_OFFSET, highlighted)
+    for cell in cells.to_dict("records"):
+        _cell_marker(cell).add_to(layer)
+    return layer, ("cells", len(cells))
+
+
+class RenderCache:
+    """LRU cache of rendered map HTML, bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries=64, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return item[0]
+
+    def put(self, key, html):
+        size = len(html.encode())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            self._data[key] = (html, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+map_cache = RenderCache()
+
+
+# Shared entries outlive a deploy: key them on the code that renders them too
+SHARED_KEY_VERSION = shared_cache.source_digest(sys.modules[__name__], pipeline) + "-" + metadata.version("folium")
+
+
+def map_cache_key(project_ids, selected_year, data_version):
+    digest = hashlib.sha1(np.sort(np.asarray(project_ids, dtype=np.int64)).tobytes()).hexdigest()
+    return (digest, int(selected_year), data_version)
+
+
+def shared_map_key(project_ids, row_keys, selected_year, data_version):
+    """Host-wide key for the same map. Positional ids are not comparable
+    across workers (one that refreshed incrementally has appended ids and
+    tombstones, one that cold-started on the same version does not), so the
+    projects are identified by their row keys (``Dataset.keys``) instead."""
+    selected = row_keys.index[np.isin(row_keys.to_numpy(), np.asarray(project_ids, dtype=np.int64))]
+    digest = hashlib.sha1("\n".join(sorted(selected)).encode("utf-8")).hexdigest()
+    return "|".join(map(str, (digest, int(selected_year), data_version, SHARED_KEY_VERSION)))
+
+
+def render_map_html(project_ids, selected_year, data_version, row_keys, build_points):
+    """Rendered map HTML for this filter state, built via ``build_points()``
+    only on a miss in both this process's cache and the host-wide one.
+    ``row_keys`` is the dataset's ``keys``. Returns None when there is
+    nothing to plot."""
+    key = map_cache_key(project_ids, selected_year, data_version)
+    html = map_cache.get(key)
+    if html is not None:
+        instrumentation.cache_event("map", "hit")
+        return html
+    shared_key = shared_map_key(project_ids, row_keys, selected_year, data_version)
+    html = shared_cache.cache.get("map", shared_key)
+    if html is not None:
+        instrumentation.cache_event("map", "shared")
+    else:
+        instrumentation.cache_event("map", "miss")
+        points = build_points()
+        if points.empty:
+            return None
+        html = build_map(points).get_root().render()
+        shared_cache.cache.set("map", shared_key, html)
+    map_cache.put(key, html)
+    return html
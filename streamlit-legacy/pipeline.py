@@ -0,0 +1,847 @@
+"""Data preparation for the dashboard, kept free of Streamlit so it can be
+benchmarked and reused outside the app."""
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+DURATION_COLUMNS = ['Duration_Months', 'Duration', 'Months', 'Project_Duration']
+
+
+def annotate_duration(df):
+    """Adds ``Original_Year``, ``End_Year``, ``Project_Span`` and
+    ``Duration_Display`` to each project, one row per project.
+
+    Projects without a positive duration get NaN in those columns.
+    """
+    duration_col = next((col for col in DURATION_COLUMNS if col in df.columns), None)
+    if df.empty or not duration_col: return df
+
+    months = pd.to_numeric(df[duration_col], errors='coerce').to_numpy(dtype=float)
+    start = pd.to_numeric(df['Year'], errors='coerce').to_numpy(dtype=float)
+    expand = (months > 0) & ~np.isnan(start)
+
+    months_int = np.where(expand, np.trunc(np.nan_to_num(months)), 0).astype(np.int64)
+    start_int = np.where(expand, np.nan_to_num(start), 0).astype(np.int64)
+    end_int = start_int + months_int // 12
+
+    out = df.copy()
+    if expand.all():
+        out['Original_Year'] = start_int
+        out['End_Year'] = end_int
+    else:
+        out['Original_Year'] = np.where(expand, start_int, np.nan)
+        out['End_Year'] = np.where(expand, end_int, np.nan)
+
+    start_s = pd.Series(start_int).astype(str)
+    end_s = pd.Series(end_int).astype(str)
+    months_s = pd.Series(months_int).astype(str)
+    span = np.where(end_int > start_int, start_s + '-' + end_s, start_s).astype(object)
+    display = np.where(
+        end_int > start_int,
+        months_s + ' months (' + start_s + '-' + end_s + ')',
+        months_s + ' months',
+    ).astype(object)
+    span[~expand] = np.nan
+    display[~expand] = np.nan
+    out['Project_Span'] = span
+    out['Duration_Display'] = display
+    return out
+
+
+def build_span_table(projects):
+    """Returns one ``(project_id, Year)`` row per calendar year a project was active.
+
+    ``project_id`` is the position of the project in ``projects``. Use it to
+    join back only the columns a view needs instead of materializing every
+    column once per year.
+    """
+    start = pd.to_numeric(projects['Year'], errors='coerce').to_numpy(dtype=float)
+    if 'Original_Year' in projects.columns:
+        end = projects['End_Year'].to_numpy(dtype=float)
+        end = np.where(np.isnan(end), start, end)
+    else:
+        end = start
+    valid = ~np.isnan(start)
+    repeats = np.where(valid, end - start + 1, 0).astype(np.int64)
+
+    project_id = np.repeat(np.arange(len(projects), dtype=np.int32), repeats)
+    # Offset of each span row within its project's run of years
+    run_starts = np.repeat(np.cumsum(repeats) - repeats, repeats)
+    offsets = np.arange(len(project_id)) - run_starts
+    year = start[project_id].astype(np.int64) + offsets
+    return pd.DataFrame({'project_id': project_id, 'Year': year.astype(np.int16)})
+
+
+def expand_projects_by_duration(df):
+    """Repeats each project once per calendar year it was active.
+
+    This is the materialized join of ``annotate_duration`` and
+    ``build_span_table``; the dashboard itself works on the two tables.
+    Rows without a valid start year have no span and are kept once, as they
+    are, in their original position.
+    """
+    if df.empty: return df
+    if not any(col in df.columns for col in DURATION_COLUMNS): return df
+
+    projects = annotate_duration(df)
+    spans = build_span_table(projects)
+    positions = spans['project_id'].to_numpy(dtype=np.int64)
+    years = spans['Year'].to_numpy(dtype=np.int64)
+    start = pd.to_numeric(projects['Year'], errors='coerce').to_numpy(dtype=float)
+    unspanned = np.flatnonzero(np.isnan(start))
+    if len(unspanned):
+        # Span rows are already grouped by project_id: a stable sort slots the others back in
+        order = np.argsort(np.concatenate([positions, unspanned]), kind='stable')
+        positions = np.concatenate([positions, unspanned])[order]
+        years = np.concatenate([years, np.zeros(len(unspanned), dtype=np.int64)])[order]
+    out = projects.iloc[positions]
+    expanded = out['Original_Year'].notna().to_numpy()
+    return out.assign(Year=np.where(expanded, years, out['Year'].to_numpy()))
+
+
+def _bitset(ids, size):
+    """Packs a list of row positions into a bitset of ``size`` bits."""
+    bits = np.zeros(size, dtype=bool)
+    bits[ids] = True
+    return np.packbits(bits)
+
+
+def _unpack(bitset, size):
+    return np.unpackbits(bitset, count=size).astype(bool)
+
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(bitset):
+    return int(_POPCOUNT[bitset].sum(dtype=np.int64))
+
+
+def _grown(bitset, size):
+    """Copy of ``bitset`` padded with zero bits up to ``size`` bits."""
+    n_bytes = (size + 7) // 8
+    out = np.zeros(n_bytes, dtype=np.uint8)
+    out[:len(bitset)] = bitset
+    return out
+
+
+def _assign_bits(bitset, ids, value):
+    """Sets (``value=True``) or clears the bits of ``ids`` in place."""
+    ids = np.asarray(ids, dtype=np.int64)
+    masks = (0x80 >> (ids & 7)).astype(np.uint8)
+    if value:
+        np.bitwise_or.at(bitset, ids >> 3, masks)
+    else:
+        np.bitwise_and.at(bitset, ids >> 3, ~masks)
+
+
+class ActiveYearIndex:
+    """Per-year bitsets over ``projects`` answering "which projects were
+    active in year Y" with a dictionary lookup instead of a row scan."""
+
+    def __init__(self, spans, n_projects):
+        self.n_projects = n_projects
+        self._bitsets = {}
+        if spans.empty: return
+        order = np.argsort(spans['Year'].to_numpy(), kind='stable')
+        years = spans['Year'].to_numpy()[order]
+        ids = spans['project_id'].to_numpy()[order]
+        unique_years, starts = np.unique(years, return_index=True)
+        for year, chunk in zip(unique_years, np.split(ids, starts[1:])):
+            self._bitsets[int(year)] = _bitset(chunk, n_projects)
+
+    @property
+    def years(self):
+        return sorted(self._bitsets)
+
+    @property
+    def bitsets(self):
+        return dict(self._bitsets)
+
+    def mask(self, year):
+        """Boolean array over all projects, True where the project is active in ``year``."""
+        bitset = self._bitsets.get(int(year))
+        if bitset is None:
+            return np.zeros(self.n_projects, dtype=bool)
+        return _unpack(bitset, self.n_projects)
+
+    def is_active(self, project_ids, year):
+        """Boolean array aligned with ``project_ids``."""
+        return self.mask(year)[np.asarray(project_ids, dtype=np.int64)]
+
+    def patched(self, removed_spans, added_spans, n_projects):
+        """New index with ``removed_spans`` cleared and ``added_spans`` set.
+
+        Only the touched years' bitsets are copied; the rest are shared with
+        this index unless ``n_projects`` grew.
+        """
+        out = ActiveYearIndex(added_spans.iloc[:0], n_projects)
+        if n_projects == self.n_projects:
+            out._bitsets = dict(self._bitsets)
+        else:
+            out._bitsets = {year: _grown(bits, n_projects) for year, bits in self._bitsets.items()}
+        touched = {}
+        for spans, value in ((removed_spans, False), (added_spans, True)):
+            for year, ids in spans.groupby('Year')['project_id']:
+                year = int(year)
+                if year not in touched:
+                    base = out._bitsets.get(year)
+                    touched[year] = np.zeros((n_projects + 7) // 8, dtype=np.uint8) if base is None else base.copy()
+                _assign_bits(touched[year], ids.to_numpy(), value)
+        for year, bits in touched.items():
+            if bits.any():
+                out._bitsets[year] = bits
+            else:
+                out._bitsets.pop(year, None)
+        return out
+
+
+class FacetIndex:
+    """One bitset per distinct value per sidebar facet.
+
+    Selections are combined with OR inside a facet and AND across facets.
+    A facet whose selection is ``None`` is not constrained; an empty list
+    matches nothing.
+    """
+
+    def __init__(self, n_projects):
+        self.n_projects = n_projects
+        self._facets = {}
+        self._all = np.packbits(np.ones(n_projects, dtype=bool))
+
+    def add_column(self, name, values):
+        """Indexes a per-project Series (aligned by position); NaN is skipped."""
+        codes, uniques = pd.factorize(pd.Series(values).reset_index(drop=True), sort=True)
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        bitsets = {}
+        for code, value in enumerate(uniques):
+            lo, hi = np.searchsorted(sorted_codes, [code, code + 1])
+            bitsets[value] = _bitset(order[lo:hi], self.n_projects)
+        self._facets[name] = bitsets
+
+    def add_bitsets(self, name, bitsets):
+        """Registers a facet whose bitsets were computed elsewhere (e.g. years)."""
+        self._facets[name] = dict(bitsets)
+
+    def values(self, name):
+        return sorted(self._facets.get(name, {}))
+
+    def _facet_bits(self, name, selected):
+        bitsets = self._facets.get(name, {})
+        bits = np.zeros_like(self._all)
+        for value in selected:
+            if value in bitsets:
+                bits |= bitsets[value]
+        return bits
+
+    def _combine(self, selections, skip=None):
+        bits = self._all.copy()
+        for name, selected in selections.items():
+            if name == skip or selected is None:
+                continue
+            bits &= self._facet_bits(name, selected)
+        return bits
+
+    def resolve(self, selections):
+        """Boolean mask over projects matching every facet selection."""
+        return _unpack(self._combine(selections), self.n_projects)
+
+    def counts(self, selections, within=None):
+        """Per-facet ``{value: n}``: projects that would match if ``value``
+        were the only choice in that facet, with the other facets as selected.
+        ``within``, a boolean mask over projects, restricts every count."""
+        restrict = None if within is None else np.packbits(within)
+        result = {}
+        for name, bitsets in self._facets.items():
+            others = self._combine(selections, skip=name)
+            if restrict is not None:
+                others &= restrict
+            result[name] = {value: _popcount(others & bits) for value, bits in bitsets.items()}
+        return result
+
+    def patched(self, n_projects, alive, removed, added):
+        """New index after an incremental refresh.
+
+        ``removed`` and ``added`` map facet names to Series of values indexed
+        by project_id. Only the bitsets of touched values are copied; values
+        left without projects are dropped. Bitset facets (years) are not
+        patched here: re-register them with ``add_bitsets``.
+        """
+        out = FacetIndex(0)
+        out.n_projects = n_projects
+        out._all = np.packbits(alive)
+        for name, bitsets in self._facets.items():
+            if n_projects == self.n_projects:
+                bitsets = dict(bitsets)
+            else:
+                bitsets = {value: _grown(bits, n_projects) for value, bits in bitsets.items()}
+            touched = {}
+            for values, flag in ((removed.get(name), False), (added.get(name), True)):
+                if values is None:
+                    continue
+                for value, ids in values.dropna().groupby(values.dropna(), observed=True):
+                    if value not in touched:
+                        base = bitsets.get(value)
+                        touched[value] = np.zeros((n_projects + 7) // 8, dtype=np.uint8) if base is None else base.copy()
+                    _assign_bits(touched[value], ids.index.to_numpy(), flag)
+            for value, bits in touched.items():
+                if bits.any():
+                    bitsets[value] = bits
+                else:
+                    bitsets.pop(value, None)
+            out._facets[name] = bitsets
+        return out
+
+
+# Ingest-time normalization: roles, skills and software are parsed once per
+# dataset and exposed as categoricals plus project↔value link tables.
+
+ROLE_MAPPINGS = {
+    'civil engineer': 'Civil Engineer',
+    'ceo': 'CEO',
+    'student': 'Student',
+    'teacher': 'Teacher',
+    'auxiliar / intern': 'Auxiliar / Intern',
+    'project manager': 'Project Manager',
+    'designer / consulter': 'Designer / Consulter',
+}
+
+
+def clean_role_value(role):
+    if pd.isna(role) or not isinstance(role, str):
+        return "Other"
+    role = role.strip()
+    role_lower = role.lower()
+    for key, value in ROLE_MAPPINGS.items():
+        if key in role_lower:
+            return value
+    # Cells come as JSON lists (["Role"]); drop the list syntax before title-casing
+    role = role.strip('"\'[]() ').replace('"', '')
+    return role.title() if role else "Other"
+
+
+def parse_list_cell(raw):
+    """Splits list-ish cells like ``["AutoCAD","ArcGIS"]`` or ``GIS, CAD`` into items."""
+    if pd.isna(raw):
+        return []
+    text = str(raw).strip()
+    if text.startswith('['):
+        try:
+            items = json.loads(text)
+            if isinstance(items, list):
+                return [str(item) for item in items]
+        except ValueError:
+            pass
+    return text.split(",")
+
+
+def normalize_skill(token):
+    return token.strip().strip('"\'[]() ').replace('"', '').replace("'", "")
+
+
+def normalize_software(token):
+    return token.strip().strip('"\'[] ').replace(" ", "_").replace("-", "_").lower()
+
+
+def build_link_table(values, normalize, name):
+    """Explodes a list column into ``(project_id, <name>)`` rows, ``<name>``
+    being a Categorical with sorted categories."""
+    project_ids = []
+    items = []
+    for project_id, raw in enumerate(values):
+        for token in parse_list_cell(raw):
+            item = normalize(token)
+            if item:
+                project_ids.append(project_id)
+                items.append(item)
+    links = pd.DataFrame({
+        'project_id': np.asarray(project_ids, dtype=np.int32),
+        name: pd.Categorical(items, categories=sorted(set(items))),
+    })
+    return links.drop_duplicates(ignore_index=True)
+
+
+def linked_values(links, name, project_ids):
+    """Sorted distinct ``<name>`` values linked to any of ``project_ids``."""
+    if links is None or links.empty:
+        return []
+    column = links[name]
+    codes = column.cat.codes.to_numpy()[links['project_id'].isin(project_ids).to_numpy()]
+    return list(column.cat.categories[np.unique(codes)])
+
+
+class RollupCube:
+    """Project counts pre-aggregated over Industry × Category × Role × active span.
+
+    Each cell groups the projects sharing those dimensions and the same
+    (start, end) years. Distinct Project_Name counts for a filter state add
+    up, per matching cell, the names found in no other cell, plus the
+    distinct names among the few that span several cells (e.g. phases).
+    """
+
+    DIMENSIONS = ["Industry", "Category", "Role"]
+
+    def __init__(self, projects):
+        start = projects["Year"].to_numpy(dtype=np.int64)
+        if "End_Year" in projects.columns:
+            end = projects["End_Year"].fillna(projects["Year"]).to_numpy(dtype=np.int64)
+        else:
+            end = start
+        columns = {"start": start, "end": end}
+        self._labels = {}
+        for dim in self.DIMENSIONS:
+            source = "Role_Clean" if dim == "Role" else dim
+            if source in projects.columns:
+                codes, labels = pd.factorize(projects[source], sort=True)
+                columns[dim] = codes
+                self._labels[dim] = list(labels)
+        name_codes, names = pd.factorize(projects["Project_Name"])
+        self.n_names = len(names)
+
+        keys = pd.DataFrame(columns)
+        group_ids, uniques = pd.factorize(pd.MultiIndex.from_frame(keys))
+        self.cells = uniques.to_frame(index=False)
+        self.cells.columns = list(columns)
+        self.cells["count"] = np.bincount(group_ids, minlength=len(self.cells))
+
+        pairs = np.unique(np.stack([group_ids, name_codes]).astype(np.int64), axis=1)
+        pair_cells, pair_names = pairs
+        exclusive = np.bincount(pair_names, minlength=self.n_names)[pair_names] == 1
+        self._exclusive_names = np.bincount(pair_cells[exclusive], minlength=len(self.cells))
+        self._shared_cells = pair_cells[~exclusive]
+        _, self._shared_names = np.unique(pair_names[~exclusive], return_inverse=True)
+
+    def _dimension_mask(self, selections, skip=None):
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim in self.DIMENSIONS:
+            selected = selections.get(dim)
+            if dim == skip or selected is None or dim not in self._labels:
+                continue
+            codes = [self._labels[dim].index(v) for v in selected if v in self._labels[dim]]
+            mask &= np.isin(self.cells[dim].to_numpy(), codes)
+        return mask
+
+    def _year_mask(self, years):
+        """Cells whose [start, end] span contains at least one of ``years``."""
+        years = np.sort(np.asarray(list(years), dtype=np.int64))
+        if len(years) == 0:
+            return np.zeros(len(self.cells), dtype=bool)
+        start = self.cells["start"].to_numpy()
+        end = self.cells["end"].to_numpy()
+        idx = np.searchsorted(years, start, side="left")
+        return (idx < len(years)) & (years[np.minimum(idx, len(years) - 1)] <= end)
+
+    def _mask(self, selections, skip=None):
+        mask = self._dimension_mask(selections, skip)
+        if skip != "Year" and selections.get("Year") is not None:
+            mask &= self._year_mask(selections["Year"])
+        return mask
+
+    def _distinct(self, mask):
+        if not mask.any():
+            return 0
+        shared = self._shared_names[mask[self._shared_cells]]
+        return int(self._exclusive_names[mask].sum()) + len(np.unique(shared))
+
+    def metrics(self, selections, timeline_year):
+        """Values for the Project Details tiles under ``selections``."""
+        mask = self._mask(selections)
+        start = self.cells["start"].to_numpy()
+        end = self.cells["end"].to_numpy()
+        return {
+            "unique_projects": self._distinct(mask),
+            "active_in_year": self._distinct(mask & (start <= timeline_year) & (end >= timeline_year)),
+            "year_range": (int(start[mask].min()), int(start[mask].max())) if mask.any() else None,
+            "multi_year": self._distinct(mask & (end > start)),
+        }
+
+    def counts(self, selections):
+        """Per-facet ``{value: n}`` project counts, each facet evaluated with
+        the other facets as selected. Same contract as ``FacetIndex.counts``."""
+        result = {}
+        for dim in self.DIMENSIONS:
+            if dim not in self._labels:
+                continue
+            mask = self._mask(selections, skip=dim)
+            sums = np.bincount(
+                self.cells[dim].to_numpy()[mask] + 1,
+                weights=self.cells["count"].to_numpy()[mask],
+                minlength=len(self._labels[dim]) + 1,
+            )
+            # Shifted by one so that code -1 (missing value) lands in slot 0
+            result[dim] = {label: int(sums[i + 1]) for i, label in enumerate(self._labels[dim])}
+        mask = self._mask(selections, skip="Year")
+        start = self.cells["start"].to_numpy()[mask]
+        end = self.cells["end"].to_numpy()[mask]
+        count = self.cells["count"].to_numpy()[mask]
+        result["Year"] = {}
+        if len(start):
+            for year in range(int(start.min()), int(end.max()) + 1):
+                result["Year"][year] = int(count[(start <= year) & (end >= year)].sum())
+        return result
+
+
+def project_metrics(filtered, active_index, timeline_year):
+    """``RollupCube.metrics`` computed from the matching rows, for filters
+    the cube has no dimension for (text search)."""
+    if filtered.empty:
+        return {"unique_projects": 0, "active_in_year": 0, "year_range": None, "multi_year": 0}
+    names = filtered["Project_Name"]
+    start = filtered["Year"].to_numpy(dtype=np.int64)
+    end = filtered["End_Year"].fillna(filtered["Year"]).to_numpy(dtype=np.int64) if "End_Year" in filtered.columns else start
+    return {
+        "unique_projects": names.nunique(),
+        "active_in_year": names[active_index.is_active(filtered.index, timeline_year)].nunique(),
+        "year_range": (int(start.min()), int(start.max())),
+        "multi_year": names[end > start].nunique(),
+    }
+
+
+# Full-text search: indexed fields and the weight of a match in each
+SEARCH_FIELDS = {"Project_Name": 3.0, "Client_Company": 2.0, "Location": 1.5, "Functions": 1.0, "Scope of work": 1.0}
+MAX_TERM_LENGTH = 32
+# Shorter words only match whole terms; longer ones also match as prefixes
+MIN_PREFIX_LENGTH = 2
+# Score of a prefix-only match relative to a whole-term match
+PREFIX_WEIGHT = 0.5
+
+
+def tokenize(values):
+    """``(positions, tokens)`` for a Series of text: lowercased, accents
+    stripped, split on anything that is not a letter or digit."""
+    text = pa.array(pd.Series(values).astype("string"), type=pa.string())
+    text = pc.replace_substring_regex(pc.utf8_lower(pc.utf8_normalize(text, "NFKD")), r"\p{Mn}+", "")
+    tokens = pc.split_pattern_regex(text, r"[^\p{L}\p{N}]+")
+    flat = pc.utf8_slice_codeunits(pc.list_flatten(tokens), 0, MAX_TERM_LENGTH)
+    keep = pc.greater(pc.utf8_length(flat), 0)
+    return pc.list_parent_indices(tokens).filter(keep).to_numpy(), flat.filter(keep)
+
+
+class TextIndex:
+    """Inverted index over the ``SEARCH_FIELDS`` of each project.
+
+    The vocabulary is sorted and postings are stored sorted by term, then
+    project, in flat arrays: the terms starting with a prefix are one range
+    of the vocabulary and their postings one slice. Each posting keeps the
+    weight of the best field its term appears in.
+    """
+
+    def __init__(self, projects, n_projects=None, ids=None):
+        self.n_projects = len(projects) if n_projects is None else n_projects
+        self.n_docs = len(projects)
+        ids = np.arange(len(projects), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        positions, tokens, weights = [], [], []
+        # Heaviest field first: after the stable sort the first duplicate posting is the best
+        for field, weight in sorted(SEARCH_FIELDS.items(), key=lambda item: -item[1]):
+            if field in projects.columns:
+                rows, field_tokens = tokenize(projects[field])
+                positions.append(ids[rows])
+                tokens.append(field_tokens)
+                weights.append(np.full(len(rows), weight, dtype=np.float32))
+        if not tokens:
+            self._store(np.array([], dtype=str), np.array([], dtype=np.int64), np.array([], dtype=np.int64),
+                        np.array([], dtype=np.float32))
+            return
+        tokens = pa.chunked_array(tokens, type=pa.string())
+        vocabulary = pc.unique(tokens).sort()
+        codes = pc.index_in(tokens, value_set=vocabulary).to_numpy()
+        self._store(np.array(vocabulary.to_pylist(), dtype=str), codes,
+                    np.concatenate(positions), np.concatenate(weights))
+
+    def _store(self, terms, codes, ids, weights):
+        order = np.argsort(codes.astype(np.int64) * (self.n_projects + 1) + ids, kind="stable")
+        codes, ids, weights = codes[order], ids[order], weights[order]
+        first = np.ones(len(codes), dtype=bool)
+        first[1:] = (codes[1:] != codes[:-1]) | (ids[1:] != ids[:-1])
+        codes = codes[first]
+        self.terms = terms
+        self.ids = ids[first]
+        self.weights = weights[first]
+        self.starts = np.searchsorted(codes, np.arange(len(terms) + 1))
+
+    def extended(self, rows, ids, alive):
+        """New index with the projects ``rows`` added under ``ids`` and the
+        postings of dead projects (``alive`` False) dropped."""
+        added = TextIndex(rows, len(alive), ids)
+        terms = np.union1d(self.terms, added.terms)
+        codes = [np.repeat(np.searchsorted(terms, index.terms), np.diff(index.starts)) for index in (self, added)]
+        ids = np.concatenate([self.ids, added.ids])
+        weights = np.concatenate([self.weights, added.weights])
+        live = alive[ids]
+        out = TextIndex.__new__(TextIndex)
+        out.n_projects = len(alive)
+        out.n_docs = int(alive.sum())
+        out._store(terms, np.concatenate(codes)[live], ids[live], weights[live])
+        used = np.diff(out.starts) > 0
+        if not used.all():
+            out.terms = out.terms[used]
+            out.starts = np.concatenate([[0], np.cumsum(np.diff(out.starts)[used])])
+        return out
+
+    def _term_range(self, word):
+        lo = int(np.searchsorted(self.terms, word))
+        if len(word) >= MIN_PREFIX_LENGTH:
+            return lo, int(np.searchsorted(self.terms, word + "\U0010ffff"))
+        return lo, lo + int(lo < len(self.terms) and self.terms[lo] == word)
+
+    def search(self, query):
+        """Relevance score per project (0 where it does not match), or None
+        when ``query`` has no words.
+
+        A project matches when every word matches one of its terms, whole
+        or as a prefix. A word scores the field weight × IDF of its best
+        matching term, times ``PREFIX_WEIGHT`` for prefix-only matches;
+        word scores add up.
+        """
+        _, words = tokenize([query or ""])
+        words = list(dict.fromkeys(words.to_pylist()))
+        if not words:
+            return None
+        total = np.zeros(self.n_projects)
+        for i, word in enumerate(words):
+            lo, hi = self._term_range(word)
+            scores = np.zeros(self.n_projects)
+            if hi > lo:
+                df = np.diff(self.starts[lo:hi + 1])
+                factor = np.full(hi - lo, PREFIX_WEIGHT)
+                factor[0] = 1.0 if self.terms[lo] == word else PREFIX_WEIGHT
+                term_scores = np.log1p(self.n_docs / np.maximum(df, 1)) * factor
+                postings = slice(self.starts[lo], self.starts[hi])
+                np.maximum.at(scores, self.ids[postings], np.repeat(term_scores, df) * self.weights[postings])
+            total = scores if i == 0 else np.where((total > 0) & (scores > 0), total + scores, 0)
+        return total
+
+
+DETAILS_RENAMES = {
+    "Scope_of_work": "Scope of Work",
+    "Duration_Display": "Duration",
+    "Client_Company": "Client",
+}
+
+
+def details_table(filtered, columns, active_index, selected_year, ranked=False):
+    """Project Details table: one row per project name (earliest start
+    first, or in the given order when ``ranked``), its original start year,
+    cleaned role, and a ⭐ on the year of names with any row (phase) active
+    in ``selected_year``, the rule ``RollupCube.metrics`` counts by."""
+    has_original = 'Original_Year' in filtered.columns
+    ordered = filtered if ranked or not has_original else filtered.sort_values('Original_Year')
+    unique_df = ordered.drop_duplicates(subset='Project_Name', keep='first')
+    year = (unique_df["Original_Year"].fillna(unique_df["Year"]) if has_original else unique_df["Year"]).astype(int)
+
+    display_df = unique_df[columns].copy()
+    if "Role" in display_df.columns and "Role_Clean" in unique_df.columns:
+        display_df["Role"] = unique_df["Role_Clean"].astype(str)
+    active_rows = pd.Series(active_index.is_active(filtered.index, selected_year), index=filtered.index)
+    active_names = set(filtered.loc[active_rows.to_numpy(), "Project_Name"])
+    is_timeline = unique_df["Project_Name"].isin(active_names).to_numpy()
+    display_df["Year"] = np.where(is_timeline, "⭐ ", "") + year.astype(str)
+    return display_df.rename(columns={k: v for k, v in DETAILS_RENAMES.items() if k in display_df.columns})
+
+
+def build_map_features(projects):
+    """Map popup/tooltip per project with valid coordinates, indexed by project_id.
+
+    Marker colors depend on the timeline year and are added at render time.
+    """
+    if "Latitud" not in projects.columns or "Longitud" not in projects.columns:
+        return pd.DataFrame(columns=["lat", "lon", "popup", "tooltip"])
+    has_coords = projects["Latitud"].notna() & projects["Longitud"].notna()
+    located = projects[has_coords]
+    if located.empty:
+        return pd.DataFrame(columns=["lat", "lon", "popup", "tooltip"])
+
+    if "Original_Year" in located.columns:
+        year = located["Original_Year"].fillna(located["Year"]).astype(int).astype(str)
+    else:
+        year = located["Year"].astype(int).astype(str)
+    name = located["Project_Name"].astype(str)
+
+    popup = "<b>" + name + "</b><br>Year: " + year
+    if "Project_Span" in located.columns:
+        span = located["Project_Span"]
+        popup = popup + ("<br>Duration: " + span.astype(str)).where(span.notna(), "")
+    if "Industry" in located.columns:
+        popup = popup + "<br>Industry: " + located["Industry"].astype(object).fillna("nan").astype(str)
+
+    return pd.DataFrame({
+        "lat": located["Latitud"].astype(float),
+        "lon": located["Longitud"].astype(float),
+        "popup": popup,
+        "tooltip": name + " (" + year + ")",
+    }, index=located.index)
+
+
+GEOHASH_BITS = 24  # per axis: the finest cells are ~2 m wide
+
+
+def _spread_bits(values):
+    """Inserts a zero bit between each of the low 32 bits of ``values``."""
+    v = values.astype(np.uint64)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def geohash_codes(lat, lon, bits=GEOHASH_BITS):
+    """Morton code of each point's cell in a ``2**bits`` x ``2**bits``
+    lon/lat grid: the cell at a coarser level ``L`` is ``code >> 2 * (bits - L)``."""
+    side = 2 ** bits
+    x = np.clip(((np.asarray(lon) + 180) / 360 * side).astype(np.int64), 0, side - 1)
+    y = np.clip(((np.asarray(lat) + 90) / 180 * side).astype(np.int64), 0, side - 1)
+    return _spread_bits(x) | (_spread_bits(y) << np.uint64(1))
+
+
+class SpatialIndex:
+    """Geohash-style grid over the located projects in ``map_features``.
+
+    Positions index ``map_features`` rows. ``select`` narrows a filter
+    selection to a viewport with vectorized comparisons; ``cells`` groups
+    points into the grid cells of any level by shifting their codes, so
+    per-cell counts never look at the projects frame.
+    """
+
+    def __init__(self, map_features, n_projects):
+        self.n_projects = n_projects
+        self.ids = map_features.index.to_numpy(dtype=np.int64)
+        self.lat = map_features["lat"].to_numpy(dtype=float)
+        self.lon = map_features["lon"].to_numpy(dtype=float)
+        self.codes = geohash_codes(self.lat, self.lon)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def select(self, project_ids, bounds=None):
+        """Positions of ``project_ids`` located inside ``bounds``
+        (``((south, west), (north, east))``, None for anywhere)."""
+        wanted = np.zeros(self.n_projects, dtype=bool)
+        wanted[np.asarray(project_ids, dtype=np.int64)] = True
+        mask = wanted[self.ids]
+        if bounds is not None:
+            (south, west), (north, east) = bounds
+            mask &= (self.lat >= south) & (self.lat <= north)
+            if west <= east:
+                mask &= (self.lon >= west) & (self.lon <= east)
+            else:  # viewport across the antimeridian
+                mask &= (self.lon >= west) | (self.lon <= east)
+        return np.flatnonzero(mask)
+
+    def extent(self, positions):
+        """``((south, west), (north, east))`` of ``positions``."""
+        lat, lon = self.lat[positions], self.lon[positions]
+        return (float(lat.min()), float(lon.min())), (float(lat.max()), float(lon.max()))
+
+    def cells(self, positions, level, highlighted=None):
+        """One row per occupied cell at grid ``level``: centroid, project
+        count and how many of them are ``highlighted`` (a boolean array
+        aligned with ``positions``)."""
+        positions = np.asarray(positions, dtype=np.int64)
+        shift = np.uint64(2 * (GEOHASH_BITS - min(max(level, 0), GEOHASH_BITS)))
+        cell, inverse, counts = np.unique(self.codes[positions] >> shift, return_inverse=True, return_counts=True)
+        if highlighted is None:
+            highlighted = np.zeros(len(positions), dtype=bool)
+        return pd.DataFrame({
+            "lat": np.bincount(inverse, weights=self.lat[positions], minlength=len(cell)) / counts,
+            "lon": np.bincount(inverse, weights=self.lon[positions], minlength=len(cell)) / counts,
+            "count": counts,
+            "highlighted": np.bincount(inverse, weights=highlighted, minlength=len(cell)).astype(np.int64),
+        }, index=pd.Index(cell, name="cell"))
+
+
+def row_keys(names):
+    """Stable key per row: Project_Name plus its occurrence number, since a
+    project can be listed more than once (e.g. one row per phase)."""
+    name = pd.Series(names).astype(str).reset_index(drop=True)
+    occurrence = name.groupby(name).cumcount()
+    return pd.Index(name + "\x1f" + occurrence.astype(str))
+
+
+def row_fingerprints(df):
+    """Hash of each row's values. Numeric columns are hashed as float64 so a
+    column flipping between int and float (e.g. one blank cell) changes nothing."""
+    numeric = {
+        col: "float64" for col in df.columns
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+    }
+    return pd.util.hash_pandas_object(df.astype(numeric), index=False).to_numpy()
+
+
+class Dataset:
+    """Everything the dashboard derives from one version of the sheet.
+
+    After an incremental refresh (see ``incremental.py``) ``projects`` may
+    contain superseded rows whose ``alive`` flag is False; every index
+    excludes them.
+    """
+
+    def __init__(self, projects, spans, active_index, facet_index, links, cube,
+                 map_features, spatial_index, text_index, keys, fingerprints, alive, raw_columns):
+        self.projects = projects
+        self.spans = spans
+        self.active_index = active_index
+        self.facet_index = facet_index
+        self.links = links
+        self.cube = cube
+        self.map_features = map_features
+        self.spatial_index = spatial_index
+        self.text_index = text_index
+        # Row key -> project_id for live projects, plus per-project row hashes
+        self.keys = keys
+        self.fingerprints = fingerprints
+        self.alive = alive
+        self.raw_columns = raw_columns
+
+
+def visible_mask(df):
+    if "show dashboard" not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    return (df["show dashboard"].astype(str).str.strip().str.lower() != "no").to_numpy()
+
+
+def filter_visible(df):
+    if "show dashboard" not in df.columns:
+        return df
+    return df[visible_mask(df)]
+
+
+def normalize_projects(visible):
+    """Per-project derived columns: duration span and cleaned role."""
+    projects = annotate_duration(visible)
+    if "Role" in projects.columns:
+        projects["Role_Clean"] = projects["Role"].map(clean_role_value).astype("category")
+    return projects
+
+
+def prepare_dataset(df):
+    """Runs the ingest stage: visibility filter, duration spans, role/skill/
+    software normalization and the year and facet indexes."""
+    visible = filter_visible(df).reset_index(drop=True)
+    projects = normalize_projects(visible)
+    spans = build_span_table(projects)
+    active_index = ActiveYearIndex(spans, len(projects))
+
+    facet_index = FacetIndex(len(projects))
+    facet_index.add_bitsets("Year", active_index.bitsets)
+    for facet_col in ["Industry", "Category"]:
+        if facet_col in projects.columns:
+            facet_index.add_column(facet_col, projects[facet_col])
+    if "Role_Clean" in projects.columns:
+        facet_index.add_column("Role", projects["Role_Clean"])
+
+    links = {}
+    if "Skills" in projects.columns:
+        links["Skills"] = build_link_table(projects["Skills"], normalize_skill, "Skill")
+    if "Software" in projects.columns:
+        links["Software"] = build_link_table(projects["Software"], normalize_software, "Software")
+    map_features = build_map_features(projects)
+    return Dataset(
+        projects, spans, active_index, facet_index, links, RollupCube(projects),
+        map_features, SpatialIndex(map_features, len(projects)), TextIndex(projects),
+        pd.Series(np.arange(len(visible)), index=row_keys(visible["Project_Name"])), row_fingerprints(visible),
+        np.ones(len(projects), dtype=bool), list(visible.columns),
+    )
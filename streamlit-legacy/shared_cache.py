@@ -0,0 +1,230 @@
+"""Cache shared by every dashboard process on the host.
+
+Each Streamlit worker keeps its own in-memory caches; this SQLite file sits
+behind them so the first worker to revalidate the sheet, prepare the
+dataset, probe a Cloudinary URL or render a map does it for all of them.
+
+Entries are pickled into namespaces ("fetch", "dataset", "urls", "map"),
+can expire, and are evicted least-recently-used once the file holds more
+than ``MAX_BYTES``. SQLite's file locking serializes writers across
+processes. Any error is treated as a cache miss, so the dashboard keeps
+working without the file.
+
+Set ``DASHBOARD_SHARED_CACHE`` to choose the file, or to an empty string to
+disable the shared cache.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA_VERSION = 1
+MAX_BYTES = 256 * 1024 * 1024
+BUSY_TIMEOUT_SECONDS = 5
+# LRU order only needs to be roughly right; don't turn every read into a write
+TOUCH_INTERVAL_SECONDS = 60
+
+
+def default_path():
+    cache_dir = os.environ.get(
+        "DASHBOARD_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+    )
+    return os.environ.get("DASHBOARD_SHARED_CACHE", os.path.join(cache_dir, "shared.sqlite"))
+
+
+def source_digest(*modules):
+    """Short hash of the modules' source files, to version entries whose
+    layout depends on the code that produced them."""
+    digest = hashlib.sha1()
+    for module in modules:
+        with open(module.__file__, "rb") as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()[:12]
+
+
+class SharedCache:
+    def __init__(self, path, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = {}
+        self.misses = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # One connection per thread, and a fresh one after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                    conn.execute("DROP TABLE IF EXISTS entries")
+                    conn.execute(
+                        "CREATE TABLE entries (namespace TEXT, key TEXT, value BLOB, size INTEGER,"
+                        " expires_at REAL, accessed_at REAL, PRIMARY KEY (namespace, key))"
+                    )
+                    conn.execute("CREATE INDEX entries_accessed ON entries (accessed_at)")
+                    conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, counter, namespace, n=1):
+        with self._lock:
+            counter[namespace] = counter.get(namespace, 0) + n
+
+    def get_many(self, namespace, keys):
+        """``{key: value}`` for the keys present and not expired."""
+        keys = list(keys)
+        if not self.path or not keys:
+            return {}
+        found = {}
+        stale = []
+        now = time.time()
+        try:
+            conn = self._connect()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, value, accessed_at FROM entries WHERE namespace = ? AND key IN ({','.join('?' * len(chunk))})"
+                    " AND (expires_at IS NULL OR expires_at > ?)",
+                    [namespace, *chunk, now],
+                ).fetchall()
+                for key, value, accessed_at in rows:
+                    found[key] = pickle.loads(value)
+                    if accessed_at < now - TOUCH_INTERVAL_SECONDS:
+                        stale.append((now, namespace, key))
+            if stale:
+                conn.executemany("UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?", stale)
+        except (sqlite3.Error, OSError, pickle.UnpicklingError, AttributeError, EOFError, ImportError):
+            found = {}
+        self._count(self.hits, namespace, len(found))
+        self._count(self.misses, namespace, len(keys) - len(found))
+        return found
+
+    def get(self, namespace, key, default=None):
+        return self.get_many(namespace, [key]).get(key, default)
+
+    def set_many(self, namespace, items, ttl=None):
+        """Stores ``{key: value}``; values larger than the whole cache are skipped."""
+        if not self.path or not items:
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        rows = []
+        for key, value in items.items():
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(blob) <= self.max_bytes:
+                rows.append((namespace, key, blob, len(blob), expires_at, now))
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._evict(conn, now)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        except (sqlite3.Error, OSError):
+            pass
+
+    def set(self, namespace, key, value, ttl=None):
+        self.set_many(namespace, {key: value}, ttl)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for namespace, key, size in conn.execute(
+            "SELECT namespace, key, size FROM entries ORDER BY accessed_at"
+        ).fetchall():
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def acquire(self, name, ttl):
+        """Takes a host-wide lease on ``name`` for ``ttl`` seconds. Returns an
+        owner token to pass to ``release``, or None if another process holds
+        the lease; a token too if it could not be checked."""
+        token = f"{os.getpid()}-{uuid.uuid4().hex}"
+        if not self.path:
+            return token
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                held = conn.execute(
+                    "SELECT 1 FROM entries WHERE namespace = 'lease' AND key = ? AND expires_at > ?", (name, now)
+                ).fetchone()
+                if not held:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entries VALUES ('lease', ?, ?, 0, ?, ?)",
+                        (name, token, now + ttl, now),
+                    )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            return None if held else token
+        except (sqlite3.Error, OSError):
+            return token
+
+    def release(self, name, token):
+        """Drops the lease on ``name`` if ``token`` still owns it: after it
+        expired, another process may have taken it over."""
+        if not self.path:
+            return
+        try:
+            self._connect().execute(
+                "DELETE FROM entries WHERE namespace = 'lease' AND key = ? AND value = ?", (name, token)
+            )
+        except (sqlite3.Error, OSError):
+            pass
+
+    def clear(self):
+        if not self.path:
+            return
+        try:
+            self._connect().execute("DELETE FROM entries")
+        except (sqlite3.Error, OSError):
+            pass
+
+    def stats(self):
+        """Per-namespace entries and bytes in the file, plus this process's hits/misses."""
+        result = {}
+        if self.path:
+            try:
+                rows = self._connect().execute(
+                    "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY namespace"
+                ).fetchall()
+            except (sqlite3.Error, OSError):
+                rows = []
+            for namespace, entries, size in rows:
+                result[namespace] = {"entries": entries, "bytes": size}
+        with self._lock:
+            for namespace in set(self.hits) | set(self.misses):
+                stats = result.setdefault(namespace, {"entries": 0, "bytes": 0})
+                stats["hits"] = self.hits.get(namespace, 0)
+                stats["misses"] = self.misses.get(namespace, 0)
+        return result
+
+
+cache = SharedCache(default_path())